@@ -1,4 +1,9 @@
+import time
 import numpy as np
+from simulation import Simulation, load_sample
+from profiler import FrameProfiler
+from metrics import Metrics, METRICS
+import decimate
 
 class Animations:
 
@@ -14,22 +19,70 @@ class Animations:
         Instance of Control class
     visualiser:
         Instance of Visual class
+    simulation:
+        Instance of Simulation class stepping pendulum and controller
     right_pressed:
         Boolean recording whether right arrow is pressed
     left_pressed:
         Boolean recording whether left arrow is pressed
+    accumulator:
+        Wall clock time not yet simulated, consumed in fixed steps of the pendulum's dt
+    max_frame_time:
+        Longest wall clock time simulated in one frame, so a stalled frame slows the simulation instead of
+        being followed by a burst of catch up steps
+    previous_angle, previous_x:
+        Pendulum angle and cart position before the last step, used to interpolate the rendered state
+    clock:
+        Function returning wall clock time in seconds
+    profiler:
+        Instance of FrameProfiler class timing each stage of the animation when enabled, also shared with
+        the simulation to time Physics.compute and Control.compute
+    sim_thread:
+        Instance of SimulationThread or SimulatorProcess class running the simulation in real time in a worker
+        thread or separate process, in which case pendulum and controller mirror its snapshots and simulation is
+        not stepped, or None
+    thread_steps:
+        Number of steps of the simulation thread already followed
+    metrics_values:
+        Metrics of the latest snapshot of the simulation thread, in METRICS order
+    jump_commands:
+        Number of commands sent to the simulation thread up to one that moved the pendulum, the state not being
+        interpolated until a snapshot has applied that many, or None
     
 
     Methods:
     --------
     animate_pendulum(self, i):
         Function used when animating to repeatedly compute attributes of Physics and Control class
-        as well as aspects of animation such as positions of various objects. Parameter 'i' is required
-        by FuncAnimation, but isn't used directly in function.
+        as well as aspects of animation such as positions of various objects, by calling step_simulation and
+        draw_pendulum. Parameter 'i' is required by FuncAnimation, but isn't used directly in function.
     animate_graph(self, i):
-        Function used to repeatedly append to lists and update plots for graph animation. Also features
-        limiting of list sizes as well as rolling of the time axis, similar to the visual of an oscilloscope.
-        Again parameter 'i' is required by FuncAnimation, but isn't used directly in function.
+        Function used to repeatedly append to the telemetry and update plots for graph animation, by calling
+        record_graph and draw_graph. Again parameter 'i' is required by FuncAnimation, but isn't used directly
+        in function.
+    step_simulation(self):
+        Computes as many fixed dt steps of the simulation as fit in the wall clock time since the last frame, or
+        follows the simulation thread when there is one
+    jumped(self):
+        Stops the next frame interpolating from the state before a command that moved the pendulum, e.g.
+        reset or set angle
+    follow_thread(self):
+        Copies the latest snapshot of the simulation thread or process into pendulum and controller, sending changes of the
+        manual input to the thread, and returns the number of steps computed since the last frame
+    draw_pendulum(self):
+        Updates positions of the pendulum objects, interpolated between the last two steps, returning the
+        objects altered
+    record_graph(self):
+        Appends the current state to the graph telemetry
+    draw_graph(self):
+        Updates plots of the graph from the telemetry in the time window, min-max decimated to the pixel width of
+        the graph, scrolling them along the fixed time axis similar to the visual of an oscilloscope, returning
+        the plots altered
+    update_hud(self):
+        Updates the performance overlay text from the profiler, or clears it when hidden
+    metrics_results(self):
+        Returns the metrics of the simulation, or of the simulation thread when there is one, as a dictionary,
+        or None without metrics
         
     """
 
@@ -38,49 +91,204 @@ class Animations:
         self.pendulum = pendulum
         self.controller = controller
         self.visualiser = visualiser
+        self.profiler = FrameProfiler()
+        self.simulation = Simulation(pendulum, controller)
+        self.simulation.profiler = self.profiler
+        self.simulation.metrics = Metrics(self.simulation)
 
         self.right_pressed = False
         self.left_pressed = False
 
+        # fixed timestep accumulator
+        self.accumulator = 0
+        self.max_frame_time = 0.1
+        self.last_frame_time = None
+        self.previous_angle = pendulum.angle
+        self.previous_x = pendulum.x
+        self.clock = time.perf_counter
+        self.hud_countdown = 0
+
+        # simulation running in a worker thread, if any, instead of the render loop
+        self.sim_thread = None
+        self.thread_steps = 0
+        self.metrics_values = None
+        self.jump_commands = None
+
     def animate_pendulum(self, i):
 
-        # no animation if paused is true
+        profiler = self.profiler
+        if profiler.enabled:
+            frame_start = profiler.clock()
+
+        self.step_simulation()
+        artists = self.draw_pendulum()
+
+        if profiler.enabled:
+            profiler.record('frame', profiler.clock() - frame_start)
+        return artists
+
+    def animate_graph(self, i):
+
+        self.record_graph()
+        return self.draw_graph()
+
+    def step_simulation(self):
+
+        profiler = self.profiler
+
+        # no simulation if paused is true
         if self.visualiser.paused == False:
 
-            self.pendulum.compute(self.controller.u)
-            self.controller.compute(self.pendulum.angle_error, self.pendulum.angular_velocity, 
-                    self.pendulum.angle_error_integral, self.pendulum.cart_velocity_error, 
-                    self.pendulum.cart_velocity_error_integral)
-            
-            # arrow buttons can be used to manually accelerate cart
-            if self.right_pressed == True:
-                self.controller.u += 50
-
-            if self.left_pressed == True:
-                self.controller.u -= 50
-            
+            # wall clock time since last frame, a resumed animation starts with a single step
+            now = self.clock()
+            if self.last_frame_time is None:
+                elapsed = self.pendulum.dt
+            else:
+                elapsed = now - self.last_frame_time
+                if profiler.enabled:
+                    profiler.record('frame_interval', elapsed)
+            self.last_frame_time = now
+
+            if self.sim_thread is not None:
+                steps = self.follow_thread()
+
+            else:
+                self.accumulator += min(elapsed, self.max_frame_time)
+
+                # arrow buttons can be used to manually accelerate cart
+                self.simulation.manual_input = 50 * (self.right_pressed - self.left_pressed)
+
+                # fixed dt steps until simulated time catches up with wall clock time
+                steps = 0
+                while self.accumulator >= self.pendulum.dt:
+                    self.previous_angle = self.pendulum.angle
+                    self.previous_x = self.pendulum.x
+                    self.simulation.step()
+                    self.accumulator -= self.pendulum.dt
+                    steps += 1
+
+            if profiler.enabled:
+                profiler.record('steps', steps)
+
+        else:
+            self.last_frame_time = None
+
+        if self.sim_thread is not None:
+            self.sim_thread.paused = self.visualiser.paused
+
+    def jumped(self):
+        if self.sim_thread is None:
+            self.previous_angle = self.pendulum.angle
+            self.previous_x = self.pendulum.x
+        else:
+            self.jump_commands = self.sim_thread.commands_sent
+
+    def follow_thread(self):
+
+        thread = self.sim_thread
+
+        # arrow buttons can be used to manually accelerate cart, sent only when changed
+        manual_input = 50 * (self.right_pressed - self.left_pressed)
+        if manual_input != self.simulation.manual_input:
+            self.simulation.manual_input = manual_input
+            thread.send('set', 'simulation', 'manual_input', manual_input)
+
+        # copying the latest snapshot, keeping the state before any new steps for interpolation
+        snapshot = thread.read()
+        steps = int(snapshot['steps']) - self.thread_steps
+        if steps:
+            self.previous_angle = self.pendulum.angle
+            self.previous_x = self.pendulum.x
+            self.thread_steps += steps
+        self.simulation.t = load_sample(snapshot, self.pendulum, self.controller)
+        self.metrics_values = snapshot['metrics']
+        if self.jump_commands is not None:
+            # not interpolating until the snapshot shows the command applied
+            self.previous_angle = self.pendulum.angle
+            self.previous_x = self.pendulum.x
+            if snapshot['commands'] >= self.jump_commands:
+                self.jump_commands = None
+
+        # wall clock time since the latest step, interpolated over as with the accumulator
+        self.accumulator = min(max(thread.clock() - float(snapshot['wall_time']), 0), self.pendulum.dt)
+        return steps
+
+    def draw_pendulum(self):
+
+        profiler = self.profiler
+        if profiler.enabled:
+            render_start = profiler.clock()
+
+        if self.visualiser.paused == False:
+
+            # interpolating between last two steps, taking the shortest way round for the angle
+            alpha = self.accumulator / self.pendulum.dt
+            angle_change = (self.pendulum.angle - self.previous_angle + np.pi) % (2 * np.pi) - np.pi
+            angle = self.previous_angle + alpha * angle_change
+            x = self.previous_x + alpha * (self.pendulum.x - self.previous_x)
+
             # updating pendulum positions
-            self.visualiser.update_pendulum(self.pendulum)
+            self.visualiser.update_pendulum(self.pendulum, angle, x)
 
-            # objects altered must be returned for real time simulation
-        return self.visualiser.line, self.visualiser.circle, self.visualiser.cart, self.visualiser.leftwheel, self.visualiser.rightwheel, self.visualiser.angle_label
+        if profiler.enabled:
+            profiler.record('update_pendulum', profiler.clock() - render_start)
+        self.update_hud()
 
-    def animate_graph(self, i):
+        # objects altered must be returned for real time simulation
+        return self.visualiser.line, self.visualiser.circle, self.visualiser.cart, self.visualiser.leftwheel, self.visualiser.rightwheel, self.visualiser.angle_label, self.visualiser.perf_label
+
+    def record_graph(self):
 
         if self.visualiser.paused == False:
-            
-            # updating lists for graph
-            self.visualiser.update_graph_lists(self.pendulum, self.controller)
 
-            # limiting lengths of lists
-            self.visualiser.limit_list_lengths
-        
-            # graph plotting
-            self.visualiser.plot_graph(self.visualiser.t_list, self.visualiser.angle_list, self.visualiser.angular_velocity_list, self.visualiser.cart_position_list, self.visualiser.cart_velocity_list, self.visualiser.u_list) 
+            profiler = self.profiler
+            if profiler.enabled:
+                record_start = profiler.clock()
+
+            # appending sample to graph telemetry
+            self.visualiser.update_graph_lists(self.pendulum, self.controller, self.simulation.t)
 
-            # rolling of graph time axis
-            if self.visualiser.t > 5:
-                self.visualiser.ax_graph.set_xlim(self.visualiser.t - 5, self.visualiser.t + 5)                
+            if profiler.enabled:
+                profiler.record('telemetry', profiler.clock() - record_start)
+
+    def draw_graph(self):
+
+        # also drawn while paused, so changing the time window of a paused graph shows the held history
+        visualiser = self.visualiser
+        profiler = self.profiler
+        if profiler.enabled:
+            plot_start = profiler.clock()
+
+        # rolling of graph plots along the fixed time axis
+        visualiser.scroll_graph(visualiser.t)
+
+        # graph plotting, decimated to two samples per pixel column of the time window
+        history = decimate.minmax(visualiser.telemetry.view(), visualiser.graph_offset,
+                visualiser.graph_offset + visualiser.graph_window, visualiser.ax_graph.bbox.width)
+        visualiser.plot_graph(history)
+
+        if profiler.enabled:
+            profiler.record('plot_graph', profiler.clock() - plot_start)
 
         return self.visualiser.theta, self.visualiser.theta_dot, self.visualiser.x_cart, self.visualiser.x_dot, self.visualiser.u_plot
-    
\ No newline at end of file
+
+    def update_hud(self):
+
+        # performance overlay refreshed a few times a second, cleared once when hidden
+        if self.profiler.enabled and self.profiler.show_hud:
+            self.hud_countdown -= 1
+            if self.hud_countdown <= 0:
+                self.visualiser.perf_label.set_text(self.profiler.hud_text())
+                self.hud_countdown = 10
+        elif self.visualiser.perf_label.get_text():
+            self.visualiser.perf_label.set_text('')
+
+    def metrics_results(self):
+
+        if self.sim_thread is not None:
+            if self.metrics_values is None or np.isnan(self.metrics_values).all():
+                return None
+            return dict(zip(METRICS, self.metrics_values.tolist()))
+
+        metrics = getattr(self.simulation, 'metrics', None)
+        return metrics.results() if metrics is not None else None
@@ -0,0 +1,63 @@
+import numpy as np
+
+class BatchControl:
+
+    """
+    Vectorised PID controllers for many inverted pendulums on carts.
+    Mirrors the Control class, but gains, enable mask and control inputs are NumPy arrays of shape (n,),
+    so many gain sets can be evaluated against a BatchPhysics instance in one pass.
+
+
+    Attributes:
+    -----------
+    n:
+        Number of controllers computed together
+    kp, kd, ki, kp_cart, kd_cart, ki_cart:
+        Arrays of angle and cart controller gains, as in Control
+    u:
+        Array of control inputs
+    u_angle:
+        Array of control inputs from angle controllers
+    u_cart:
+        Array of control inputs from cart controllers
+    controller_enabled:
+        Boolean array used to enable / disable each controller
+
+
+    Methods:
+    --------
+    compute(self, angle_error, angular_velocity, angle_error_integral, cart_velocity_error, cart_velocity_error_integral):
+        Determines control inputs of all controllers, with disabled controllers masked to zero
+
+    """
+
+    def __init__(self, n):
+
+        self.n = n
+
+        # gains
+        self.kp = np.full(n, 100.0)
+        self.kd = np.full(n, 20.0)
+        self.ki = np.full(n, 1.0)
+        self.kp_cart = np.full(n, 0.2)
+        self.kd_cart = np.full(n, 0.1)
+        self.ki_cart = np.full(n, 0.01)
+
+        self.u = np.zeros(n) # initial cart control inputs (acceleration)
+
+        # individual control inputs for angle & cart PID
+        self.u_angle = np.zeros(n)
+        self.u_cart = np.zeros(n)
+
+        self.controller_enabled = np.zeros(n, dtype=bool)
+
+    def compute(self, angle_error, angular_velocity, angle_error_integral, cart_velocity_error, cart_velocity_error_integral):
+
+        u_angle = - self.kp*angle_error + self.kd*(angular_velocity) - self.ki*angle_error_integral
+        u_cart = self.kp_cart*cart_velocity_error - self.kd_cart*(self.u) + self.ki_cart*cart_velocity_error_integral
+
+        # disabled controllers give zero control input
+        self.u_angle = np.where(self.controller_enabled, u_angle, 0.0)
+        self.u_cart = np.where(self.controller_enabled, u_cart, 0.0)
+
+        self.u = self.u_angle + self.u_cart
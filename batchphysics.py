@@ -0,0 +1,133 @@
+import numpy as np
+from integrators import SemiImplicitEuler
+
+class BatchPhysics:
+
+    """
+    Vectorised physics calculations for many independent pendulums on carts.
+    Mirrors the Physics class, but every state attribute is a NumPy array of shape (n,) and compute
+    advances all n systems in one call.
+
+
+    Attributes:
+    -----------
+    n:
+        Number of pendulums simulated together
+    angle, angular_velocity, angular_acceleration, xdot, x:
+        Arrays of pendulum angle, angular velocity, angular acceleration, cart velocity and cart position
+    u:
+        Control input of each pendulum on its cart
+    dt:
+        Time interval of each step, shared by all pendulums
+    integrator:
+        Integrator used to advance all states by dt each step, semi-implicit Euler by default (see integrators.py)
+    g, length, angular_damping, cart_damping:
+        Acceleration due to gravity, length of the pendulum and damping constants. Either scalars shared
+        by all pendulums or arrays of shape (n,) giving per-system parameters
+    angle_error_integral, angle_error, cart_velocity_error, cart_velocity_error_integral:
+        Arrays of errors and error integrals, as in Physics
+    cart_ref, angle_ref:
+        Reference cart velocity and reference angle (degrees), scalars or arrays of shape (n,)
+    init_angle:
+        Initial angles of the pendulums relative to vertically upwards
+
+
+    Methods:
+    --------
+    compute(self, u):
+        Updates all state arrays by one step for control input u (scalar or array of shape (n,)),
+        limiting the angles of the pendulums to [-180, 180]
+    derivatives(self, state, u):
+        Returns time derivatives of a state array of shape (6, n), rows ordered as in Physics.derivatives
+    get_state(self):
+        Returns the state integrated by the integrators as an array of shape (6, n)
+    set_state(self, state):
+        Sets the state arrays in place from an array of shape (6, n)
+    pendulum_pos(self, theta):
+        Returns arrays of x, y coordinates of the pendulums from angles, cart positions and lengths
+    add_velocity(self, add_v):
+        Adds "add_v" (scalar or array) to the angular velocities
+    set_angle(self, angle_in):
+        Sets angles from a value in degrees (scalar or array)
+    reset(self):
+        Returns every system to its initial angle with zero velocities, positions and error integrals
+
+    """
+
+    def __init__(self, n, u=0):
+
+        self.n = n
+
+        self.angle = np.full(n, np.deg2rad(-20))
+        self.angular_velocity = np.zeros(n)
+        self.angular_acceleration = np.zeros(n)
+        self.u = np.zeros(n) + u # control input
+        self.xdot = np.zeros(n)
+        self.x = np.zeros(n)
+        self.dt = 0.03
+        self.integrator = SemiImplicitEuler()
+
+        self.g = 9.81
+        self.length = 15
+        self.angular_damping = 0.1
+        self.cart_damping = 0.5
+
+        self.angle_error_integral = np.zeros(n)
+        self.angle_error = np.zeros(n)
+        self.cart_velocity_error = np.zeros(n)
+        self.cart_velocity_error_integral = np.zeros(n)
+
+        self.cart_ref = 0
+        self.angle_ref = 0
+
+        self.init_angle = np.full(n, np.deg2rad(-20))
+
+    def compute(self, u):
+
+        self.angular_acceleration = (
+            (self.g*np.sin(self.angle)/self.length)
+            - u*np.cos(self.angle)/self.length
+            - (self.angular_damping * self.angular_velocity) )
+
+        self.angle_error = np.deg2rad(self.angle_ref) - self.angle
+        self.cart_velocity_error = self.cart_ref - self.xdot
+
+        # integration of state over dt, the default integrator updates the state arrays in place
+        self.integrator.step(self, u)
+
+        # limiting angles, masked so only wrapped pendulums are touched
+        np.add(self.angle, 2 * np.pi, out=self.angle, where=self.angle < -np.pi)
+        np.subtract(self.angle, 2 * np.pi, out=self.angle, where=self.angle > np.pi)
+
+    def derivatives(self, state, u):
+        angle, angular_velocity, x, xdot, angle_error_integral, cart_velocity_error_integral = state
+        angular_acceleration = (
+            (self.g*np.sin(angle)/self.length)
+            - u*np.cos(angle)/self.length
+            - (self.angular_damping * angular_velocity) )
+        return np.array([angular_velocity, angular_acceleration, xdot, u - self.cart_damping*xdot,
+                np.deg2rad(self.angle_ref) - angle, self.cart_ref - xdot])
+
+    def get_state(self):
+        return np.array([self.angle, self.angular_velocity, self.x, self.xdot,
+                self.angle_error_integral, self.cart_velocity_error_integral])
+
+    def set_state(self, state):
+        for current, new in zip((self.angle, self.angular_velocity, self.x, self.xdot,
+                self.angle_error_integral, self.cart_velocity_error_integral), state):
+            current[:] = new
+
+    def pendulum_pos(self, theta):
+        return (self.x + self.length*np.sin(theta), self.length*np.cos(theta))
+
+    def add_velocity(self, add_v):
+        self.angular_velocity += add_v
+
+    def set_angle(self, angle_in):
+        self.angle[:] = np.deg2rad(angle_in)
+
+    def reset(self):
+        self.angle[:] = self.init_angle
+        for state in (self.angular_velocity, self.angular_acceleration, self.xdot, self.x,
+                self.angle_error_integral, self.cart_velocity_error_integral):
+            state[:] = 0
@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import platform
+import sys
+
+from benchmarks.suite import BENCHMARKS, METRICS
+
+"""
+Runs the benchmark suite and compares results against a stored baseline.
+
+    python -m benchmarks                    run all benchmarks and compare with benchmarks/baseline.json
+    python -m benchmarks graph memory       run selected benchmarks only
+    python -m benchmarks --save-baseline    store the results as the new baseline
+
+Exits with status 1 if any metric is worse than the baseline by more than the tolerance. Baselines are
+machine specific, so save one on the machine used for gating before comparing.
+"""
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+def compare(results, baseline, tolerance):
+    # returns names of metrics worse than baseline by more than tolerance, printing the comparison
+    regressions = []
+    print(f"{'metric':<40} {'value':>14} {'baseline':>14} {'change':>8}")
+    for name, value in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            print(f"{name:<40} {value:>14,.1f} {'-':>14} {'-':>8}")
+            continue
+        if reference:
+            change = (value - reference) / reference
+        else:
+            # a zero baseline, e.g. allocations of a step, allows no growth at all
+            change = 0.0 if value == reference else float('inf')
+        worse = -change if METRICS[name] else change
+        flag = ''
+        # small absolute values (e.g. a few bytes of memory growth) are noise, not regressions
+        if worse > tolerance and (abs(value - reference) > 1 or not reference):
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<40} {value:>14,.1f} {reference:>14,.1f} {change:>+8.0%}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark simulation and rendering hot paths")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+            help=f"benchmarks to run (default all): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON file (default benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+            help="fraction a metric may be worse than baseline before failing (default 0.25)")
+    args = parser.parse_args(argv)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in args.benchmarks or BENCHMARKS:
+        print(f"running {name}...", file=sys.stderr)
+        results.update(BENCHMARKS[name]())
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as file:
+                baseline = json.load(file).get('metrics', {})
+        baseline.update(results)
+        with open(args.baseline, 'w') as file:
+            json.dump({'machine': platform.platform(), 'python': platform.python_version(),
+                    'metrics': baseline}, file, indent=4)
+            file.write('\n')
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)['metrics']
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
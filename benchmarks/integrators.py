@@ -0,0 +1,63 @@
+import argparse
+import time
+import numpy as np
+
+from physics import Physics
+from integrators import INTEGRATORS, make_integrator
+
+"""
+Benchmark of the integrators in integrators.py against the original semi-implicit Euler update of Physics.
+Runs an undamped, uncontrolled pendulum (which conserves energy) for each integrator and time step,
+reporting steps/sec, derivative evaluations per simulated second and relative energy drift.
+
+Run from the repository root with: python -m benchmarks.integrators
+"""
+
+def energy(pend):
+    # energy per unit mass and length squared of pendulum with fixed cart, angle measured from upright
+    return 0.5 * pend.angular_velocity**2 + pend.g / pend.length * np.cos(pend.angle)
+
+def run(name, dt, duration, init_angle):
+    pend = Physics(0)
+    pend.angular_damping = 0
+    pend.dt = dt
+    pend.angle = np.deg2rad(init_angle)
+    pend.integrator = make_integrator(name)
+
+    steps = int(round(duration / dt))
+    start_energy = energy(pend)
+    start = time.perf_counter()
+    for i in range(steps):
+        pend.compute(0)
+    elapsed = time.perf_counter() - start
+    # the default integrator doesn't count its evaluations, keeping its step free of allocation
+    evaluations = getattr(pend.integrator, 'evaluations', steps * getattr(pend.integrator, 'evaluations_per_step', 1))
+
+    # drift relative to the energy scale g/L, as the energy itself passes through zero
+    drift = abs(energy(pend) - start_energy) / (pend.g / pend.length)
+    return {
+        'integrator': name,
+        'dt': dt,
+        'steps_per_sec': steps / elapsed,
+        'sim_seconds_per_sec': duration / elapsed,
+        'evaluations_per_sim_second': evaluations / duration,
+        'energy_drift': drift,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare integrators by speed and energy drift")
+    parser.add_argument("--duration", type=float, default=60.0, help="simulated time per run in seconds")
+    parser.add_argument("--angle", type=float, default=-20.0, help="initial angle in degrees")
+    parser.add_argument("--dt", type=float, nargs="+", default=[0.01, 0.03, 0.1], help="time steps to compare")
+    args = parser.parse_args(argv)
+
+    results = [run(name, dt, args.duration, args.angle) for dt in args.dt for name in INTEGRATORS]
+
+    print(f"{'integrator':<20} {'dt':>6} {'steps/s':>10} {'sim s/s':>10} {'evals/sim s':>12} {'energy drift':>13}")
+    for r in results:
+        print(f"{r['integrator']:<20} {r['dt']:>6g} {r['steps_per_sec']:>10,.0f} {r['sim_seconds_per_sec']:>10,.0f} "
+              f"{r['evaluations_per_sim_second']:>12,.0f} {r['energy_drift']:>13.2e}")
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import itertools
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from physics import Physics
+from controlpid import Control
+from simulation import Simulation
+
+"""
+Benchmarks of the simulation, control and rendering hot paths, run by python -m benchmarks.
+
+Every benchmark returns a dict of metric name to value. METRICS records for each metric whether
+higher values are better, which is used when comparing against a stored baseline.
+"""
+
+# metric name: True if higher is better
+METRICS = {
+    'physics_compute_steps_per_sec': True,
+    'control_compute_steps_per_sec': True,
+    'simulation_step_steps_per_sec': True,
+    'simulation_step_alloc_bytes_per_step': False,
+    'kernel_steps_per_sec': True,
+    'animate_pendulum_frames_per_sec': True,
+    'graph_frame_us_at_1k_samples': False,
+    'graph_frame_us_at_10k_samples': False,
+    'graph_frame_us_at_100k_samples': False,
+    'graph_blit_frame_us': False,
+    'graph_blit_frame_us_20min_window': False,
+    'memory_growth_bytes_per_1k_frames': False,
+    'headless_startup_ms': False,
+}
+
+def best_rate(function, calls, repeats=3):
+    # best of several runs of "calls" calls, as calls per second
+    best = float('inf')
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        for i in range(calls):
+            function()
+        best = min(best, time.perf_counter() - start)
+    return calls / best
+
+def headless_visual():
+    # visualiser and animations on the non interactive Agg backend, so no display is needed
+    import matplotlib
+    matplotlib.use('Agg')
+    from visual import Visual
+    from animations import Animations
+
+    controller = Control()
+    controller.controller_enabled = True
+    pendulum = Physics(controller.u)
+    visualiser = Visual(pendulum)
+    animate = Animations(pendulum, controller, visualiser)
+
+    # clock advancing exactly one dt per frame, so every frame computes one step
+    frame_clock = itertools.count(0, pendulum.dt)
+    animate.clock = lambda: next(frame_clock)
+    return animate
+
+def physics_compute():
+    pendulum = Physics(0)
+    return {'physics_compute_steps_per_sec': best_rate(lambda: pendulum.compute(0.0), 50000)}
+
+def control_compute():
+    controller = Control()
+    controller.controller_enabled = True
+    compute = lambda: controller.compute(0.1, 0.2, 0.01, 0.3, 0.02)
+    return {'control_compute_steps_per_sec': best_rate(compute, 50000)}
+
+def simulation_step():
+    controller = Control()
+    controller.controller_enabled = True
+    simulation = Simulation(Physics(controller.u), controller)
+    return {'simulation_step_steps_per_sec': best_rate(simulation.step, 50000)}
+
+def step_allocations():
+    # bytes allocated while a step is in progress, averaged over many steps, traced one step at a time so
+    # temporaries freed within the step are counted. Python floats come from a free list and cost nothing
+    controller = Control()
+    controller.controller_enabled = True
+    simulation = Simulation(Physics(controller.u), controller)
+    steps = 10000
+    for i in range(1000):
+        simulation.step()
+
+    tracemalloc.start()
+    allocated = 0
+    for i in itertools.repeat(None, steps):
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        simulation.step()
+        allocated += tracemalloc.get_traced_memory()[1] - start
+    tracemalloc.stop()
+    return {'simulation_step_alloc_bytes_per_step': allocated / steps}
+
+def kernel_steps():
+    import kernel
+    controller = Control()
+    controller.controller_enabled = True
+    state, params = kernel.pack(Physics(controller.u), controller)
+    kernel.simulate(state, params, 10) # compiles the kernel before timing
+    steps = 1000000 if kernel.numba_available() else 20000
+    return {'kernel_steps_per_sec': steps * best_rate(lambda: kernel.simulate(state, params, steps), 1)}
+
+def animate_pendulum():
+    animate = headless_visual()
+    return {'animate_pendulum_frames_per_sec': best_rate(lambda: animate.animate_pendulum(0), 5000)}
+
+def graph_frames():
+    # cost of one graph frame (telemetry append and plot update) as the session history grows
+    animate = headless_visual()
+    results = {}
+    frames = 0
+    for history in (1000, 10000, 100000):
+        while frames < history:
+            animate.animate_pendulum(0)
+            animate.visualiser.update_graph_lists(animate.pendulum, animate.controller, animate.simulation.t)
+            frames += 1
+        rate = best_rate(lambda: animate.animate_graph(0), 500)
+        frames += 1500
+        results[f'graph_frame_us_at_{history // 1000}k_samples'] = 1e6 / rate
+    return results
+
+def graph_blit():
+    # cost of one blitted graph frame once the plots scroll, including restoring the cached background
+    from renderloop import Blitter
+    animate = headless_visual()
+    visualiser = animate.visualiser
+    blitter = Blitter(visualiser.graph_fig.canvas, [visualiser.theta, visualiser.theta_dot, visualiser.x_cart,
+            visualiser.x_dot, visualiser.u_plot])
+    def frame():
+        animate.step_simulation()
+        animate.record_graph()
+        animate.draw_graph()
+        blitter.blit()
+    for i in range(1000):
+        frame()
+    results = {'graph_blit_frame_us': 1e6 / best_rate(frame, 500)}
+
+    # widest time window with the telemetry full, decimated to the graph width
+    visualiser.set_graph_window(1200)
+    while len(visualiser.telemetry) < visualiser.telemetry.capacity:
+        animate.step_simulation()
+        animate.record_graph()
+    results['graph_blit_frame_us_20min_window'] = 1e6 / best_rate(frame, 500)
+    return results
+
+def memory_growth():
+    # memory still allocated after a long run of pendulum and graph frames, measured between two points
+    # of the same traced run so objects replaced every frame (e.g. copies held by the plot lines) cancel out
+    animate = headless_visual()
+    frames = 20000
+    tracemalloc.start()
+    for i in range(2000):
+        animate.animate_pendulum(0)
+        animate.animate_graph(0)
+    start, _ = tracemalloc.get_traced_memory()
+    for i in range(frames):
+        animate.animate_pendulum(0)
+        animate.animate_graph(0)
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'memory_growth_bytes_per_1k_frames': max(0, end - start) / (frames / 1000)}
+
+def headless_startup():
+    # wall clock time of a one step run of main.py --headless in a new interpreter, dominated by imports
+    main = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+    best = float('inf')
+    for repeat in range(5):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, main, '--headless', '--steps', '1'], check=True, capture_output=True)
+        best = min(best, time.perf_counter() - start)
+    return {'headless_startup_ms': 1000 * best}
+
+BENCHMARKS = {
+    'physics_compute': physics_compute,
+    'control_compute': control_compute,
+    'simulation_step': simulation_step,
+    'step_allocations': step_allocations,
+    'kernel': kernel_steps,
+    'animate_pendulum': animate_pendulum,
+    'graph': graph_frames,
+    'graph_blit': graph_blit,
+    'memory': memory_growth,
+    'startup': headless_startup,
+}
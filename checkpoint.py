@@ -0,0 +1,142 @@
+import struct
+import numpy as np
+
+from integrators import INTEGRATORS, make_integrator
+
+"""
+Checkpoints of the complete state of a simulation, for continuing or branching a run from a saved point.
+
+A checkpoint is a single CHECKPOINT_DTYPE record holding every attribute of Physics and Control, the simulated
+time, manual input and scenario progress of the Simulation, and the integrator and its adaptive step. Restoring a
+checkpoint and stepping gives exactly the same trajectory as the run it was taken from. As bytes, a checkpoint is
+a 16 byte header (magic, version, record size) followed by the record.
+
+Checkpoints are saved and loaded by headless.py. The GUI has no state of its own to save, as the time of the graph
+of Visual is set from the simulated time every frame.
+"""
+
+MAGIC = b'PENDCKP\x00'
+VERSION = 2
+HEADER = struct.Struct('<8sII') # magic, version, record size
+
+# modes of Control, stored by index
+MODES = ('pid', 'lqr')
+
+PHYSICS_DTYPE = np.dtype([(name, np.float64) for name in (
+    'angle', 'angular_velocity', 'angular_acceleration', 'u', 'xdot', 'x', 'dt', 'g', 'length', 'angular_damping',
+    'cart_damping', 'angle_error_integral', 'angle_error', 'cart_velocity_error', 'cart_velocity_error_integral',
+    'cart_ref', 'angle_ref', 'init_angle')])
+
+CONTROL_DTYPE = np.dtype([(name, np.float64) for name in (
+    'kp', 'kd', 'ki', 'kp_cart', 'kd_cart', 'ki_cart', 'u', 'u_angle', 'u_cart')] + [
+    ('controller_enabled', np.bool_),
+    ('mode', np.uint8),
+    ('lqr_q', np.float64, (4,)),
+    ('lqr_r', np.float64),
+    ('lqr_capture_angle', np.float64),
+])
+
+CHECKPOINT_DTYPE = np.dtype([
+    ('physics', PHYSICS_DTYPE),
+    ('control', CONTROL_DTYPE),
+    ('t', np.float64),
+    ('manual_input', np.float64),
+    ('integrator', np.uint8), # index in INTEGRATORS
+    ('integrator_step', np.float64), # adaptive step size of RK45, NaN if none
+    ('scenario_index', np.int64), # progress of the scenario, -1 without one
+    ('scenario_steps', np.int64),
+])
+
+def capture(simulation):
+    """Returns a checkpoint (a CHECKPOINT_DTYPE record) of a Simulation."""
+    checkpoint = np.zeros((), dtype=CHECKPOINT_DTYPE)
+    pend = simulation.pendulum
+    ctrl = simulation.controller
+
+    for name in PHYSICS_DTYPE.names:
+        checkpoint['physics'][name] = getattr(pend, name)
+    for name in CONTROL_DTYPE.names:
+        if name == 'mode':
+            checkpoint['control'][name] = MODES.index(ctrl.mode)
+        else:
+            checkpoint['control'][name] = getattr(ctrl, name)
+
+    checkpoint['t'] = simulation.t
+    checkpoint['manual_input'] = simulation.manual_input
+    checkpoint['integrator'] = list(INTEGRATORS).index(pend.integrator.name)
+    step = getattr(pend.integrator, 'h', None)
+    checkpoint['integrator_step'] = np.nan if step is None else step
+
+    scenario = getattr(simulation, 'scenario', None)
+    checkpoint['scenario_index'] = -1 if scenario is None else scenario.index
+    checkpoint['scenario_steps'] = -1 if scenario is None else scenario.steps
+    return checkpoint
+
+def restore(checkpoint, simulation):
+    """
+    Sets a Simulation to the state of a checkpoint. The scenario of the simulation, if any, continues from the
+    progress of the checkpoint, and metrics of the simulation start again from the restored state.
+    """
+    pend = simulation.pendulum
+    ctrl = simulation.controller
+
+    for name in PHYSICS_DTYPE.names:
+        setattr(pend, name, float(checkpoint['physics'][name]))
+    for name in CONTROL_DTYPE.names:
+        value = checkpoint['control'][name]
+        if name == 'mode':
+            ctrl.mode = MODES[int(value)]
+        elif name == 'controller_enabled':
+            ctrl.controller_enabled = bool(value)
+        elif name == 'lqr_q':
+            ctrl.lqr_q = tuple(value.tolist())
+        else:
+            setattr(ctrl, name, float(value))
+    ctrl.set_plant(pend)
+
+    simulation.t = float(checkpoint['t'])
+    simulation.manual_input = float(checkpoint['manual_input'])
+
+    name = list(INTEGRATORS)[int(checkpoint['integrator'])]
+    if pend.integrator.name != name:
+        pend.integrator = make_integrator(name)
+    if hasattr(pend.integrator, 'h'):
+        step = float(checkpoint['integrator_step'])
+        pend.integrator.h = None if np.isnan(step) else step
+
+    if getattr(simulation, 'scenario', None) is not None:
+        restore_scenario(checkpoint, simulation.scenario)
+    if getattr(simulation, 'metrics', None) is not None:
+        simulation.metrics.reset(simulation)
+
+def restore_scenario(checkpoint, scenario):
+    """Continues a Scenario from the progress of a checkpoint, if it was taken with one."""
+    if checkpoint['scenario_index'] >= 0:
+        scenario.seek(int(checkpoint['scenario_index']), int(checkpoint['scenario_steps']))
+
+def to_bytes(checkpoint):
+    """Returns a checkpoint as bytes, header first."""
+    return HEADER.pack(MAGIC, VERSION, CHECKPOINT_DTYPE.itemsize) + checkpoint.tobytes()
+
+def from_bytes(data):
+    """Returns the checkpoint of bytes written by to_bytes, raising ValueError for anything else."""
+    if len(data) < HEADER.size:
+        raise ValueError("Data is too short to be a pendulum checkpoint")
+    magic, version, record_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Data is not a pendulum checkpoint")
+    if version != VERSION or record_size != CHECKPOINT_DTYPE.itemsize or len(data) != HEADER.size + record_size:
+        raise ValueError(f"Checkpoint has unsupported version {version} or record size {record_size}")
+    return np.frombuffer(data, dtype=CHECKPOINT_DTYPE, count=1, offset=HEADER.size)[0].copy()
+
+def save_checkpoint(path, simulation):
+    """Writes a checkpoint of a Simulation to a file."""
+    with open(path, 'wb') as file:
+        file.write(to_bytes(capture(simulation)))
+
+def load_checkpoint(path, simulation):
+    """Restores a Simulation from a checkpoint file, returning the checkpoint."""
+    with open(path, 'rb') as file:
+        checkpoint = from_bytes(file.read())
+    restore(checkpoint, simulation)
+    return checkpoint
@@ -1,4 +1,6 @@
-import numpy as np
+import math
+import lqr
+import metrics
 from PyQt6.QtWidgets import QMainWindow, QWidget, QSlider, QLabel, QGridLayout, QPushButton, QCheckBox
 from PyQt6.QtCore import Qt
 
@@ -20,6 +22,9 @@ class ControlPanel(QMainWindow):
         Instance of Animations class
     control_panel_visibility:
         Boolean that records whether control panel is visible
+    commands:
+        Command sink (e.g. SimulationThread) of a simulation running outside the render loop, with a
+        send(name, *args) method, or None to apply commands directly to the simulation of animate
     various sliders & buttons:
         Sliders and buttons that are present in the control panel window
 
@@ -28,10 +33,17 @@ class ControlPanel(QMainWindow):
     --------
     update_slider(self, label, name_start, new_value, variable_name, object_from, title_name):
         Updates a given objects attribute as well as the label of the slider to the value on the slider
+    set_parameter(self, object_from, name, value):
+        Sets an attribute of pendulum or controller, also sending it to the command sink if there is one. Setting a
+        parameter of the plant updates the LQR gains of controller
+    send(self, name, *args):
+        Sends a command (see Simulation.apply) to the command sink, or applies it directly without one
     add_slider(self, scale, min, max, slider_val, name_colon):
         Helper function used to create new sliders
     add_button(self, text, function, row, col, layout):
         Helper function used to create new buttons
+    show_metrics(self, results):
+        Shows a results dictionary of Metrics in the metrics label, or a placeholder for None
     reset(self, press):
         Function used to reset the pendulum to its initial angle position, returning cart position, cart velocity,
         angular velocity, error integrals and control inputs to zero as well as reseting the frames
@@ -54,6 +66,7 @@ class ControlPanel(QMainWindow):
         self.setCentralWidget(central_widget)
         # control panel initially invisible
         self.control_panel_visibility = False
+        self.commands = None
 
         # helper functions used to create various sliders for variables
         kp_slider, kp_label, self.kp_value = self.add_slider(1, 0, 150, 100, "kp: ")
@@ -76,7 +89,7 @@ class ControlPanel(QMainWindow):
         ki_cart_slider.valueChanged.connect(lambda value : self.update_slider(ki_cart_label, "ki_cart", value/100, "ki_cart_value", self.controller, "cart ki"))
 
         v_slider, v_label, self.v_value = self.add_slider(1, -5, 5, 1, "add angle velocity: ")
-        v_slider.valueChanged.connect(lambda value : self.update_slider(v_label, "", value, "v_value", self.controller, "add angle velocity"))
+        v_slider.valueChanged.connect(lambda value : self.update_slider(v_label, "v_value", value, "v_value", self.controller, "add angle velocity"))
 
         init_angle_slider, init_angle_label, self.init_angle_value = self.add_slider(1, -180, 180, -20, "initial angle: ")
         init_angle_slider.valueChanged.connect(lambda value : self.update_slider(init_angle_label, "init_angle", value, "init_angle_value", self.pendulum, "initial angle"))
@@ -121,8 +134,8 @@ class ControlPanel(QMainWindow):
                     Qt.WindowType.WindowTitleHint)
 
         # using helper function to create various buttons
-        self.velocity_button = self.add_button("Add Velocity (press 'V')", lambda : self.pendulum.add_velocity(self.v_value), 8, 0, layout)
-        self.angle_button = self.add_button("Set Angle (press 'A')", lambda : self.pendulum.set_angle(self.set_angle_value), 8, 1, layout)
+        self.velocity_button = self.add_button("Add Velocity (press 'V')", lambda : self.send("add_velocity", self.v_value), 8, 0, layout)
+        self.angle_button = self.add_button("Set Angle (press 'A')", lambda : self.send("set_angle", self.set_angle_value), 8, 1, layout)
         self.exit_button = self.add_button("Hide Control Panel (press 'C')", lambda : (self.hide(), setattr(self, "control_panel_visibility", False)), 8, 2, layout)
         self.reset_button = self.add_button("Reset (press 'R')", self.reset, 9, 0, layout)
         self.pause_button = self.add_button("Pause (press 'P')", self.visualiser.pause, 9, 1, layout)
@@ -131,9 +144,30 @@ class ControlPanel(QMainWindow):
         enable_controller = QCheckBox()
         enable_label = QLabel("Enable Controller:")
         layout.addWidget(enable_label, 10, 2)
-        enable_controller.toggled.connect(lambda value : setattr(self.controller, "controller_enabled", value))
+        enable_controller.toggled.connect(lambda value : self.set_parameter(self.controller, "controller_enabled", value))
         layout.addWidget(enable_controller, 11, 2)
 
+        # checkbox for profiling and performance overlay on pendulum animation
+        enable_hud = QCheckBox()
+        hud_label = QLabel("Performance HUD:")
+        layout.addWidget(hud_label, 12, 2)
+        enable_hud.toggled.connect(lambda value : (setattr(self.animate.profiler, "enabled", value),
+                setattr(self.animate.profiler, "show_hud", value)))
+        layout.addWidget(enable_hud, 13, 2)
+
+        # checkbox for LQR state feedback in place of the PID controllers
+        enable_lqr = QCheckBox()
+        lqr_label = QLabel("LQR Controller:")
+        layout.addWidget(lqr_label, 12, 0)
+        enable_lqr.toggled.connect(lambda value : self.set_parameter(self.controller, "mode", "lqr" if value else "pid"))
+        layout.addWidget(enable_lqr, 13, 0)
+
+        # closed loop performance of the run since the last reset, refreshed by the render loop
+        self.metrics_label = QLabel()
+        self.show_metrics(None)
+        layout.addWidget(QLabel("Performance Metrics (since reset):"), 14, 0)
+        layout.addWidget(self.metrics_label, 15, 0, 1, 3)
+
         arrow_label = QLabel("Control Cart with Arrow Keys:")
         layout.addWidget(arrow_label, 10, 0)
 
@@ -154,9 +188,27 @@ class ControlPanel(QMainWindow):
         if name_start != "v_value": # no object update for angular velocity adding
             # updating original object attributes
             if name_start != "angle" and name_start != "init_angle":
-                setattr(object_from, name_start, new_value)
+                self.set_parameter(object_from, name_start, new_value)
             elif name_start == "init_angle": # radian conversions needed for angular sliders
-                setattr(object_from, name_start, np.deg2rad(new_value))
+                self.set_parameter(object_from, name_start, math.radians(new_value))
+
+    def set_parameter(self, object_from, name, value):
+        # parameters are also kept on the local objects, which mirror a simulation running elsewhere
+        setattr(object_from, name, value)
+        if object_from is self.pendulum and name in lqr.PLANT_PARAMETERS:
+            self.controller.set_plant(self.pendulum)
+        if self.commands is not None:
+            target = "pendulum" if object_from is self.pendulum else "controller"
+            self.commands.send("set", target, name, value)
+
+    def send(self, name, *args):
+        if self.commands is None:
+            self.animate.simulation.apply(name, *args)
+        else:
+            self.commands.send(name, *args)
+        # the pendulum jumps rather than moves, so isn't interpolated from where it was
+        if name in ("reset", "set_angle"):
+            self.animate.jumped()
 
     def add_slider(self, scale, min, max, slider_val, name_colon):
         slider = QSlider(Qt.Orientation.Horizontal)
@@ -175,16 +227,14 @@ class ControlPanel(QMainWindow):
         layout.addWidget(button, row, col)
         return button
 
+    def show_metrics(self, results):
+        if results is None:
+            self.metrics_label.setText("no metrics")
+        else:
+            self.metrics_label.setText(metrics.summary(results))
+
     def reset(self, press):
     
-        self.pendulum.x = 0
-        self.pendulum.xdot = 0
-        self.pendulum.angle = self.pendulum.init_angle
-        self.pendulum.angular_velocity = 0
-        self.pendulum.angle_error_integral = 0
-        self.pendulum.cart_velocity_error_integral = 0
-        self.controller.u_angle = 0
-        self.controller.u_cart = 0
-        self.controller.u = 0
+        self.send("reset")
         
         self.visualiser.frames = self.visualiser.frame_count() # resets frames
\ No newline at end of file
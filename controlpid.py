@@ -1,8 +1,12 @@
+import math
+import lqr
+
 class Control:
 
     """
     PID controllers for inverted pendulum on cart.
-    Includes controller for keeping pendulum upright and controller for minimising cart movement.
+    Includes controller for keeping pendulum upright and controller for minimising cart movement, or
+    alternatively an LQR state feedback controller for both (see lqr.py).
 
 
     Attributes:
@@ -27,15 +31,30 @@ class Control:
         Control input from cart controller
     controller_enabled:
         Boolean controlled externally used to enable / disable controller
+    mode:
+        Controller used when enabled, 'pid' or 'lqr'
+    lqr_q, lqr_r:
+        LQR weights of the state (angle, angular velocity, cart position, cart velocity) and of the control input
+    lqr_gain:
+        LQR state feedback gains for the plant given to set_plant, None until then
+    lqr_capture_angle:
+        Angle error in radians within which the LQR controller is used, outside of which the linearisation no longer
+        holds and the PID controllers bring the pendulum back
 
 
     Methods:
     --------
     compute(self, angle_error, angular_velocity, angle_error_integral, cart_velocity_error, cart_velocity_error_integral):
         Determines control inputs from angle & cart velocity controllers
+    set_plant(self, pendulum):
+        Computes the LQR gains for the parameters of a Physics instance, cached so only new parameters are solved
 
     """
 
+    # fixed attributes stored in slots rather than a per instance dict, as for Physics
+    __slots__ = ('kp', 'kd', 'ki', 'kp_cart', 'kd_cart', 'ki_cart', 'u', 'u_angle', 'u_cart', 'controller_enabled',
+                 'mode', 'lqr_q', 'lqr_r', 'lqr_gain', 'lqr_capture_angle')
+
     def __init__(self):
 
         # gains
@@ -54,11 +73,25 @@ class Control:
 
         self.controller_enabled = False
 
+        self.mode = 'pid'
+        self.lqr_q = (100.0, 1.0, 1.0, 1.0)
+        self.lqr_r = 0.01
+        self.lqr_gain = None
+        self.lqr_capture_angle = math.radians(45)
+
     def compute(self, angle_error, angular_velocity, angle_error_integral, cart_velocity_error, cart_velocity_error_integral):
 
         # calculating control input
-        if self.controller_enabled == True:
-            self.u_angle = - self.kp*angle_error + self.kd*(angular_velocity) - self.ki*angle_error_integral
+        if self.controller_enabled == True and self.mode == 'lqr' and abs(angle_error) < self.lqr_capture_angle:
+            # u = -Kx for the state measured from the references, x = (-angle error, angular velocity,
+            # -cart velocity error integral, -cart velocity error)
+            k_angle, k_angular_velocity, k_x, k_xdot = self.lqr_gain
+            self.u_angle = k_angle*angle_error - k_angular_velocity*angular_velocity
+            self.u_cart = k_x*cart_velocity_error_integral + k_xdot*cart_velocity_error
+
+        elif self.controller_enabled == True:
+            # gains may be ints, and negating the product rather than the gain avoids allocating a negative int
+            self.u_angle = - (self.kp*angle_error) + self.kd*(angular_velocity) - self.ki*angle_error_integral
             self.u_cart = self.kp_cart*cart_velocity_error - self.kd_cart*(self.u) + self.ki_cart*cart_velocity_error_integral
 
         # controller off
@@ -66,4 +99,8 @@ class Control:
             self.u_angle = 0
             self.u_cart = 0  
             
-        self.u = self.u_angle + self.u_cart
\ No newline at end of file
+        self.u = self.u_angle + self.u_cart
+
+    def set_plant(self, pendulum):
+        self.lqr_gain = lqr.lqr_gain(pendulum.g, pendulum.length, pendulum.angular_damping, pendulum.cart_damping,
+                self.lqr_q, self.lqr_r)
\ No newline at end of file
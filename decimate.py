@@ -0,0 +1,37 @@
+import numpy as np
+from numpy.lib import recfunctions
+
+"""
+Min-max (peak preserving) decimation of telemetry for plotting long histories.
+
+The samples inside a time window are split into one bin per pixel column of the plot, and each bin is
+replaced by its minimum and maximum, so a plot of any length of history costs at most two points per pixel
+while spikes narrower than a pixel are still drawn at their full height.
+"""
+
+def minmax(history, t_start, t_end, bins):
+    """
+    Returns the samples of "history", a structured array ordered by its 't' field, in [t_start, t_end]
+    decimated to at most 2 * bins samples of the same dtype. Each bin of equal time width gives a pair of
+    samples at the time of its first sample, holding the minimum and then the maximum of every other field.
+    One sample either side of the window is kept so the plots reach the edges. Windows with few enough
+    samples are returned undecimated as a view.
+    """
+    t = history['t']
+    start = max(0, int(np.searchsorted(t, t_start)) - 1)
+    end = min(len(t), int(np.searchsorted(t, t_end, side='right')) + 1)
+    bins = max(1, int(bins))
+    if end - start <= 2 * bins:
+        return history[start:end]
+
+    # start index of every non empty bin
+    window = t[start:end]
+    edges = np.linspace(window[0], window[-1], bins + 1)[:-1]
+    starts = np.unique(np.searchsorted(window, edges))
+
+    values = recfunctions.structured_to_unstructured(history[start:end])
+    decimated = np.empty((len(starts), 2, values.shape[1]))
+    np.minimum.reduceat(values, starts, axis=0, out=decimated[:, 0])
+    np.maximum.reduceat(values, starts, axis=0, out=decimated[:, 1])
+    decimated[:, :, 0] = window[starts, None]
+    return recfunctions.unstructured_to_structured(decimated.reshape(-1, values.shape[1]), dtype=history.dtype)
@@ -0,0 +1,142 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from controlpid import Control
+from batchphysics import BatchPhysics
+from batchcontrol import BatchControl
+from simulation import BatchSimulation
+from metrics import BatchMetrics, METRICS
+
+"""
+PID gain sweep for inverted pendulum on cart. Simulates a grid of gain sets headlessly across a process
+pool, each worker stepping a vectorised batch of pendulums, and reports the performance metrics of metrics.py
+(settling time, overshoot, rms angle error, control effort, cart excursion and time to fall) for every gain set.
+"""
+
+GAINS = ('kp', 'kd', 'ki', 'kp_cart', 'kd_cart', 'ki_cart')
+RESULT_DTYPE = np.dtype([(name, np.float64) for name in GAINS + METRICS])
+
+def gain_grid(ranges):
+    """
+    Returns a structured array with one record per gain set in the full grid of "ranges".
+    "ranges" maps gain names to (start, stop, num) tuples or sequences of values, gains not given keep
+    their defaults from Control.
+    """
+    defaults = Control()
+    axes = []
+    for name in GAINS:
+        spec = ranges.get(name, [getattr(defaults, name)])
+        if isinstance(spec, tuple) and len(spec) == 3:
+            spec = np.linspace(spec[0], spec[1], int(spec[2]))
+        axes.append(np.asarray(spec, dtype=np.float64))
+
+    grid = np.empty(int(np.prod([len(axis) for axis in axes])), dtype=RESULT_DTYPE)
+    for name, values in zip(GAINS, np.meshgrid(*axes, indexing='ij')):
+        grid[name] = values.ravel()
+    for name in METRICS:
+        grid[name] = np.nan
+    return grid
+
+def run_chunk(gains, steps, dt=0.03, init_angle=-20, settle_band=2):
+    """
+    Simulates one batch of gain sets with every controller enabled, returning the gains with their metrics
+    filled in. Metrics are accumulated step by step so no trajectories are stored.
+    """
+    n = len(gains)
+    pendulums = BatchPhysics(n)
+    pendulums.dt = dt
+    pendulums.init_angle[:] = np.deg2rad(init_angle)
+    pendulums.reset()
+    controllers = BatchControl(n)
+    for name in GAINS:
+        setattr(controllers, name, gains[name].copy())
+    controllers.controller_enabled[:] = True
+    simulation = BatchSimulation(pendulums, controllers)
+    simulation.metrics = BatchMetrics(simulation, settle_band)
+
+    for i in range(steps):
+        simulation.step()
+
+    results = gains.copy()
+    for name, values in simulation.metrics.results().items():
+        results[name] = values
+    return results
+
+def sweep(ranges, duration=10, dt=0.03, init_angle=-20, settle_band=2, workers=None, chunk_size=None):
+    """
+    Runs the full gain grid of "ranges" across a process pool, returning a structured array of gains and
+    metrics (RESULT_DTYPE). Each worker simulates chunks of "chunk_size" gain sets as one vectorised batch.
+    """
+    grid = gain_grid(ranges)
+    workers = workers or os.cpu_count()
+    steps = int(round(duration / dt))
+
+    # several chunks per worker keeps the pool balanced, without making batches too small to vectorise
+    if chunk_size is None:
+        chunk_size = min(4096, max(64, -(-len(grid) // (workers * 4))))
+    chunks = [grid[start:start + chunk_size] for start in range(0, len(grid), chunk_size)]
+    if not chunks:
+        return np.empty(0, dtype=RESULT_DTYPE)
+
+    if workers == 1:
+        return np.concatenate([run_chunk(chunk, steps, dt, init_angle, settle_band) for chunk in chunks])
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(run_chunk, chunks, [steps] * len(chunks), [dt] * len(chunks),
+                [init_angle] * len(chunks), [settle_band] * len(chunks))
+        return np.concatenate(list(results))
+
+def save_results(path, results):
+    """Saves results column by column to a compressed .npz file."""
+    np.savez_compressed(path, **{name: results[name] for name in results.dtype.names})
+
+def load_results(path):
+    """Loads results saved by save_results back into a structured array."""
+    with np.load(path) as columns:
+        results = np.empty(len(columns[RESULT_DTYPE.names[0]]), dtype=RESULT_DTYPE)
+        for name in RESULT_DTYPE.names:
+            results[name] = columns[name]
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep PID gains of the pendulum controller")
+    for name in GAINS:
+        parser.add_argument("--" + name.replace('_', '-'), nargs=3, type=float, metavar=("START", "STOP", "NUM"),
+                help=f"range of {name} values (default Control value)")
+    parser.add_argument("--duration", type=float, default=10.0, help="simulated time per gain set in seconds")
+    parser.add_argument("--dt", type=float, default=0.03, help="time step in seconds")
+    parser.add_argument("--angle", type=float, default=-20.0, help="initial angle in degrees")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default all cores)")
+    parser.add_argument("--chunk-size", type=int, help="gain sets simulated per vectorised batch")
+    parser.add_argument("--output", default="sweep.npz", help="columnar results file (default sweep.npz)")
+    args = parser.parse_args(argv)
+    for name in GAINS:
+        spec = getattr(args, name)
+        if spec is not None and int(spec[2]) < 1:
+            parser.error(f"--{name.replace('_', '-')} needs NUM of at least 1")
+    if args.chunk_size is not None and args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    ranges = {name: tuple(getattr(args, name)) for name in GAINS if getattr(args, name) is not None}
+
+    start = time.perf_counter()
+    results = sweep(ranges, args.duration, args.dt, args.angle, workers=args.workers, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+    save_results(args.output, results)
+
+    settled = np.isfinite(results['settling_time'])
+    print(f"{len(results)} gain sets in {elapsed:.2f} s, {settled.sum()} settled, results saved to {args.output}")
+    if settled.any():
+        best = results[settled][np.argmin(results['settling_time'][settled])]
+        print("fastest settling: " + ", ".join(f"{name}={best[name]:g}" for name in RESULT_DTYPE.names))
+
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-from PyQt6.QtWidgets import QMainWindow, QWidget, QGridLayout, QPushButton
+from PyQt6.QtWidgets import QMainWindow, QWidget, QGridLayout, QPushButton, QComboBox
 from PyQt6.QtCore import Qt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas # widget for matplotlib
 
@@ -14,6 +14,8 @@ class GraphWindow(QMainWindow):
         Instance of Visual class
     canvas:
         Matplotlib graph figure embedded in widget
+    window_box:
+        Drop down list of time window widths used to zoom the graph in and out
     exit_button:
         Button for closing / toggling visibility of graph window
         
@@ -41,6 +43,13 @@ class GraphWindow(QMainWindow):
                     Qt.WindowType.CustomizeWindowHint |
                     Qt.WindowType.WindowTitleHint)
         
+        # zooming time axis, from the default 10 s up to the full telemetry history
+        self.window_box = QComboBox()
+        for window in (10, 30, 60, 120, 300, 600, 1200):
+            self.window_box.addItem(f"Time window: {window} s" if window < 60 else f"Time window: {window // 60} min", window)
+        self.window_box.currentIndexChanged.connect(lambda index: self.visualiser.set_graph_window(self.window_box.itemData(index)))
+        layout.addWidget(self.window_box, 6, 0)
+
         self.exit_button = QPushButton("Hide Graph (press 'G')")
         self.exit_button.clicked.connect(lambda : (self.hide(), setattr(self, "graph_visibility", False)))
         layout.addWidget(self.exit_button, 7, 0)
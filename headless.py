@@ -0,0 +1,215 @@
+import argparse
+import math
+import time
+import numpy as np
+
+from physics import Physics
+from controlpid import Control
+from simulation import Simulation
+from integrators import INTEGRATORS, make_integrator
+from recorder import Recorder
+from metrics import Metrics, summary
+from trajcache import TrajectoryCache
+from scenario import Scenario
+from checkpoint import capture, restore, restore_scenario, save_checkpoint, load_checkpoint
+
+"""
+Headless runner for inverted pendulum on cart simulation. Runs the physics and control loop as fast
+as possible without Qt or matplotlib, reporting the performance metrics of the controller and optionally
+saving the trajectory to a .npy file.
+
+A run can start from a checkpoint, and can be forked into what-if branches: each branch continues from the
+state at the end of the run with its own changes, e.g.
+
+    python headless.py --enable-controller --duration 60 --branch kp=80 --branch kp=120,kd=30 --branch impulse=0.5
+"""
+
+# settings a branch can change, set with Simulation.apply so e.g. the LQR gains follow the plant
+BRANCH_PHYSICS = ('g', 'length', 'angular_damping', 'cart_damping', 'angle_ref', 'cart_ref')
+BRANCH_CONTROL = ('kp', 'kd', 'ki', 'kp_cart', 'kd_cart', 'ki_cart', 'controller_enabled', 'mode')
+
+def parse_branch(spec):
+    """
+    Returns the (name, value) changes of a branch given as comma separated name=value pairs. Names are
+    parameters of Physics (BRANCH_PHYSICS) and Control (BRANCH_CONTROL), or impulse (added angular
+    velocity), angle (set angle in degrees) and scenario (path of a scenario file started with the branch).
+    """
+    changes = []
+    for item in spec.split(','):
+        name, separator, value = item.partition('=')
+        name = name.strip()
+        if not separator or name not in BRANCH_PHYSICS + BRANCH_CONTROL + ('impulse', 'angle', 'scenario'):
+            raise ValueError(f"Invalid branch change {item!r}, expected name=value")
+        if name == 'controller_enabled':
+            value = value.strip().lower() in ('1', 'true', 'yes', 'on')
+        elif name not in ('mode', 'scenario'):
+            value = float(value)
+        changes.append((name, value))
+    return changes
+
+def apply_branch(simulation, changes):
+    """Applies the changes of a branch (see parse_branch) to a simulation."""
+    for name, value in changes:
+        if name == 'impulse':
+            simulation.apply('add_velocity', value)
+        elif name == 'angle':
+            simulation.apply('set_angle', value)
+        elif name == 'scenario':
+            simulation.scenario = Scenario.load(value, simulation.pendulum.dt)
+        elif name in BRANCH_PHYSICS:
+            simulation.apply('set', 'pendulum', name, value)
+        else:
+            simulation.apply('set', 'controller', name, value)
+
+def run_branches(simulation, branches, steps):
+    """
+    Runs every branch (a spec of parse_branch) for "steps" steps from the current state of a simulation,
+    restoring that state before each, and returns a list of (spec, trajectory, metrics results).
+    """
+    start = capture(simulation)
+    scenario = simulation.scenario
+    results = []
+    for spec in branches:
+        simulation.scenario = scenario
+        restore(start, simulation)
+        apply_branch(simulation, parse_branch(spec))
+        simulation.metrics = Metrics(simulation)
+        trajectory = simulation.run(steps)
+        results.append((spec, trajectory, simulation.metrics.results()))
+    return results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the pendulum simulation without a GUI")
+    length = parser.add_mutually_exclusive_group()
+    length.add_argument("--steps", type=int, help="number of steps to simulate")
+    length.add_argument("--duration", type=float, default=10.0, help="simulated time in seconds (default 10)")
+    parser.add_argument("--angle", type=float, default=-20.0, help="initial angle in degrees (default -20)")
+    parser.add_argument("--dt", type=float, help="time step in seconds (default Physics.dt)")
+    parser.add_argument("--integrator", choices=list(INTEGRATORS), default="semi_implicit_euler",
+            help="integration method (default semi_implicit_euler)")
+    parser.add_argument("--enable-controller", action="store_true", help="enable the controller")
+    parser.add_argument("--controller", choices=["pid", "lqr"], default="pid",
+            help="controller used when enabled (default pid)")
+    parser.add_argument("--fast", action="store_true",
+            help="run in the fused kernel, compiled with Numba when installed (default integrator and PID controller only)")
+    parser.add_argument("--output", help="save trajectory to this .npy file")
+    parser.add_argument("--record", help="stream every step to this recording file, replayable with main.py --replay")
+    parser.add_argument("--scenario", help="apply the timed events of this JSON (or YAML) scenario file")
+    parser.add_argument("--checkpoint", help="start from the state and parameters of this checkpoint file, continuing a --scenario from its progress")
+    parser.add_argument("--save-checkpoint", metavar="PATH", help="save a checkpoint of the state at the end of the run")
+    parser.add_argument("--branch", action="append", default=[], metavar="CHANGES",
+            help="after the run, continue a what-if branch from its final state with comma separated name=value "
+                 "changes, e.g. kp=80,impulse=0.5 (repeatable, see parse_branch)")
+    parser.add_argument("--branch-duration", type=float,
+            help="simulated time of each branch in seconds (default the length of the run)")
+    parser.add_argument("--cache", metavar="DIR",
+            help="serve identical runs from a trajectory cache in this directory, without metrics or recording")
+    parser.add_argument("--cache-size", type=float, default=1024.0,
+            help="size of the trajectory cache in MB, least recently used runs are evicted beyond it (default 1024)")
+    parser.add_argument("--telemetry-port", type=int,
+            help="stream the state to TCP clients on this port, see telemetryserver.py (0 picks a free port)")
+    parser.add_argument("--telemetry-host", default="127.0.0.1", help="address the telemetry server listens on")
+    parser.add_argument("--telemetry-decimation", type=int, default=1, help="stream every N-th step (default 1)")
+    parser.add_argument("--telemetry-batch", type=int, default=32, help="samples per telemetry frame (default 32)")
+    args = parser.parse_args(argv)
+    for name in ('steps', 'duration', 'branch_duration'):
+        value = getattr(args, name)
+        if value is not None and value <= 0:
+            parser.error(f"--{name.replace('_', '-')} must be positive")
+    # neither the fused kernel nor a cache hit applies scenario events
+    if args.scenario and (args.fast or args.cache):
+        parser.error("--scenario can't be combined with --fast or --cache")
+    # nor publishes every step
+    if args.telemetry_port is not None and (args.fast or args.cache):
+        parser.error("--telemetry-port can't be combined with --fast or --cache")
+    if args.telemetry_decimation < 1 or args.telemetry_batch < 1:
+        parser.error("--telemetry-decimation and --telemetry-batch must be at least 1")
+    if args.dt is not None and args.checkpoint:
+        parser.error("--dt can't be combined with --checkpoint, which sets dt")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    controller = Control()
+    pendulum = Physics(controller.u)
+    pendulum.init_angle = math.radians(args.angle)
+    pendulum.angle = pendulum.init_angle
+    if args.dt is not None:
+        pendulum.dt = args.dt
+    pendulum.integrator = make_integrator(args.integrator)
+    controller.controller_enabled = args.enable_controller
+    controller.mode = args.controller
+
+    simulation = Simulation(pendulum, controller)
+    checkpoint = None
+    if args.checkpoint:
+        checkpoint = load_checkpoint(args.checkpoint, simulation)
+    # compiled for the dt of the checkpoint, if any, and continued from its progress
+    if args.scenario:
+        simulation.scenario = Scenario.load(args.scenario, pendulum.dt)
+        if checkpoint is not None:
+            restore_scenario(checkpoint, simulation.scenario)
+    # the fused kernel and cache hits don't update metrics
+    if not (args.fast or args.cache):
+        simulation.metrics = Metrics(simulation)
+    if args.record:
+        simulation.recorder = Recorder(args.record, pendulum.dt)
+    if args.telemetry_port is not None:
+        # imported here, so runs without telemetry don't load asyncio
+        from telemetryserver import TelemetryServer
+        simulation.publisher = TelemetryServer(args.telemetry_host, args.telemetry_port, args.telemetry_decimation,
+                args.telemetry_batch)
+        simulation.publisher.start()
+        print(f"streaming telemetry on {args.telemetry_host}:{simulation.publisher.port}")
+
+    start = time.perf_counter()
+    if args.cache:
+        cache = TrajectoryCache(args.cache, int(args.cache_size * 2**20))
+        trajectory = cache.run(simulation, steps=args.steps, duration=args.duration, fast=args.fast)
+        print("trajectory served from cache" if cache.hits else "trajectory added to cache")
+    else:
+        trajectory = simulation.run(steps=args.steps, duration=args.duration, fast=args.fast)
+    elapsed = time.perf_counter() - start
+
+    if args.record:
+        simulation.recorder.close()
+        print(f"recording saved to {args.record}")
+    if simulation.publisher is not None:
+        simulation.publisher.stop()
+        print(f"telemetry stopped, {simulation.publisher.dropped()} frames dropped for slow clients")
+        simulation.publisher = None
+
+    print(f"{len(trajectory)} steps, {simulation.t:.2f} s simulated in {elapsed:.3f} s "
+          f"({len(trajectory) / elapsed:,.0f} steps/s)")
+    print(f"final angle {np.rad2deg(pendulum.angle):.2f} deg, cart position {pendulum.x:.2f}")
+    if simulation.metrics is not None:
+        print(summary(simulation.metrics.results()))
+
+    if args.output:
+        np.save(args.output, trajectory)
+        print(f"trajectory saved to {args.output}")
+    if args.save_checkpoint:
+        save_checkpoint(args.save_checkpoint, simulation)
+        print(f"checkpoint saved to {args.save_checkpoint}")
+
+    if args.branch:
+        simulation.recorder = None
+        steps = len(trajectory) if args.branch_duration is None else int(round(args.branch_duration / pendulum.dt))
+        start = time.perf_counter()
+        branches = run_branches(simulation, args.branch, steps)
+        elapsed = time.perf_counter() - start
+        print(f"\n{len(branches)} branches of {steps} steps from t = {trajectory['t'][-1] if len(trajectory) else 0:.2f} s "
+              f"in {elapsed:.3f} s")
+        for spec, branch, results in branches:
+            # a branch duration shorter than half a step gives no steps
+            if not len(branch):
+                print(f"\nbranch {spec}: no steps")
+                continue
+            print(f"\nbranch {spec}: final angle {branch['angle'][-1]:.4f} rad, cart position {branch['x'][-1]:.2f}")
+            print(summary(results))
+
+    return trajectory
+
+if __name__ == "__main__":
+    main()
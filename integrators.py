@@ -0,0 +1,184 @@
+import numpy as np
+
+"""
+Integrators for advancing Physics and BatchPhysics by one time step dt.
+
+Every integrator has a step(self, system, u) method, where "system" provides dt, get_state(),
+set_state(state) and derivatives(state, u) for the state
+(angle, angular_velocity, x, xdot, angle_error_integral, cart_velocity_error_integral).
+The control input u is held constant over the step.
+"""
+
+class SemiImplicitEuler:
+
+    """
+    Semi-implicit (symplectic) Euler integration, the original update of Physics.compute.
+    Velocities are updated first and positions are advanced with the new velocities.
+
+
+    Attributes:
+    -----------
+    name:
+        Name used to select the integrator
+    evaluations_per_step:
+        Derivative evaluations per step (one), not counted as the other integrators do so the default step
+        allocates nothing
+
+    """
+
+    name = 'semi_implicit_euler'
+    evaluations_per_step = 1
+
+    def step(self, system, u):
+        # uses angular_acceleration and errors already computed by system.compute
+        dt = system.dt
+        system.angle_error_integral += system.angle_error * dt
+        system.cart_velocity_error_integral += system.cart_velocity_error * dt
+        system.angular_velocity += system.angular_acceleration * dt
+        system.angle += system.angular_velocity * dt
+        system.xdot += (u - system.cart_damping*system.xdot) * dt
+        system.x += system.xdot*dt
+
+class Euler:
+
+    """
+    Explicit (forward) Euler integration, every state advanced using derivatives at the start of the step.
+
+
+    Attributes:
+    -----------
+    name:
+        Name used to select the integrator
+    evaluations:
+        Count of derivative evaluations (one per step)
+
+    """
+
+    name = 'euler'
+
+    def __init__(self):
+        self.evaluations = 0
+
+    def step(self, system, u):
+        self.evaluations += 1
+        state = system.get_state()
+        system.set_state(state + system.dt * system.derivatives(state, u))
+
+class RK4:
+
+    """
+    Classical fourth order Runge-Kutta integration with a fixed step.
+
+
+    Attributes:
+    -----------
+    name:
+        Name used to select the integrator
+    evaluations:
+        Count of derivative evaluations (four per step)
+
+    """
+
+    name = 'rk4'
+
+    def __init__(self):
+        self.evaluations = 0
+
+    def step(self, system, u):
+        self.evaluations += 4
+        dt = system.dt
+        state = system.get_state()
+        k1 = system.derivatives(state, u)
+        k2 = system.derivatives(state + dt/2 * k1, u)
+        k3 = system.derivatives(state + dt/2 * k2, u)
+        k4 = system.derivatives(state + dt * k3, u)
+        system.set_state(state + dt/6 * (k1 + 2*k2 + 2*k3 + k4))
+
+class RK45:
+
+    """
+    Adaptive Dormand-Prince 5(4) Runge-Kutta integration. Each step of length dt is covered by as many
+    internal steps as the error estimate requires, the internal step size being carried between steps.
+    For array valued systems one step size is shared, chosen for the worst system.
+
+
+    Attributes:
+    -----------
+    name:
+        Name used to select the integrator
+    rtol, atol:
+        Relative and absolute error tolerances per internal step
+    min_step:
+        Smallest internal step as a fraction of dt, a step this short being accepted whatever its error so a step
+        always finishes
+    h:
+        Internal step size proposed for the next step, None until the first step
+    evaluations:
+        Count of derivative evaluations, including rejected internal steps
+
+    """
+
+    name = 'rk45'
+
+    # Dormand-Prince tableau
+    A = ((),
+         (1/5,),
+         (3/40, 9/40),
+         (44/45, -56/15, 32/9),
+         (19372/6561, -25360/2187, 64448/6561, -212/729),
+         (9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+         (35/384, 0, 500/1113, 125/192, -2187/6784, 11/84))
+    E = (71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40) # 5th minus 4th order weights
+
+    def __init__(self, rtol=1e-6, atol=1e-8, min_step=1e-4):
+        self.rtol = rtol
+        self.atol = atol
+        self.min_step = min_step
+        self.h = None
+        self.evaluations = 0
+
+    def step(self, system, u):
+        dt = system.dt
+        state = system.get_state()
+        h = dt if self.h is None else self.h
+        t = 0
+        k_first = system.derivatives(state, u)
+        self.evaluations += 1
+        # a diverged (inf or NaN) state has no meaningful error, so is carried on as the fixed step integrators
+        # would, as is a step already at the minimum size
+        diverged = not np.all(np.isfinite(state))
+
+        while dt - t > 1e-12 * dt: # tolerance stops float round off leaving a vanishing final step
+            h_step = min(h, dt - t)
+            k = [k_first]
+            for a in self.A[1:6]:
+                k.append(system.derivatives(state + h_step * sum(coef * ki for coef, ki in zip(a, k) if coef), u))
+            # 5th order solution, its derivative is also the first stage of the next internal step
+            new_state = state + h_step * sum(coef * ki for coef, ki in zip(self.A[6], k) if coef)
+            k.append(system.derivatives(new_state, u))
+            self.evaluations += 6
+
+            error = h_step * sum(coef * ki for coef, ki in zip(self.E, k) if coef)
+            scale = self.atol + self.rtol * np.maximum(np.abs(state), np.abs(new_state))
+            error_norm = np.max(np.sqrt(np.mean((error / scale)**2, axis=0)))
+
+            if error_norm <= 1 or diverged or h_step <= self.min_step * dt:
+                t += h_step
+                state = new_state
+                k_first = k[6]
+            # standard step size controller, limited to shrinking or growing by 5x
+            if not diverged and (h_step == h or error_norm > 1): # a step shortened to finish dt says nothing about h
+                factor = 5 if error_norm == 0 else min(5, max(0.2, 0.9 * error_norm**-0.2))
+                h = max(h_step * factor, self.min_step * dt)
+
+        self.h = h
+        system.set_state(state)
+
+INTEGRATORS = {integrator.name: integrator for integrator in (SemiImplicitEuler, Euler, RK4, RK45)}
+
+def make_integrator(name, **kwargs):
+    """Returns a new integrator instance from its name ('semi_implicit_euler', 'euler', 'rk4' or 'rk45')."""
+    try:
+        return INTEGRATORS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Unknown integrator '{name}', expected one of {', '.join(INTEGRATORS)}") from None
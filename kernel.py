@@ -0,0 +1,176 @@
+import math
+import numpy as np
+
+"""
+Fused physics and PID step kernel for fast headless runs.
+
+Runs many steps of Physics.compute (semi-implicit Euler) followed by Control.compute in one call, on plain
+float64 arrays instead of objects. The loop is compiled with Numba when it is installed, otherwise an
+equivalent NumPy version vectorised over systems is used. Numba is imported on first use only, so importing
+this module stays cheap.
+
+State and parameters are arrays of shape (n, len(STATE)) and (n, len(PARAMS)), one row per system.
+"""
+
+# same order as the fields of TRAJECTORY_DTYPE after 't'
+STATE = ('angle', 'angular_velocity', 'x', 'xdot', 'u', 'u_angle', 'u_cart',
+         'angle_error_integral', 'cart_velocity_error_integral')
+PHYSICS_PARAMS = ('dt', 'g', 'length', 'angular_damping', 'cart_damping', 'angle_ref', 'cart_ref')
+CONTROL_PARAMS = ('kp', 'kd', 'ki', 'kp_cart', 'kd_cart', 'ki_cart', 'controller_enabled')
+PARAMS = PHYSICS_PARAMS + CONTROL_PARAMS
+
+def _kernel(state, params, steps, trajectory, record):
+    # plain Python loop over systems and steps, compiled by Numba
+    for i in range(state.shape[0]):
+        angle = state[i, 0]
+        angular_velocity = state[i, 1]
+        x = state[i, 2]
+        xdot = state[i, 3]
+        u = state[i, 4]
+        u_angle = state[i, 5]
+        u_cart = state[i, 6]
+        angle_error_integral = state[i, 7]
+        cart_velocity_error_integral = state[i, 8]
+
+        dt = params[i, 0]
+        g = params[i, 1]
+        length = params[i, 2]
+        angular_damping = params[i, 3]
+        cart_damping = params[i, 4]
+        angle_ref = params[i, 5] * (math.pi / 180)
+        cart_ref = params[i, 6]
+        kp = params[i, 7]
+        kd = params[i, 8]
+        ki = params[i, 9]
+        kp_cart = params[i, 10]
+        kd_cart = params[i, 11]
+        ki_cart = params[i, 12]
+        enabled = params[i, 13] != 0
+
+        for step in range(steps):
+            # physics
+            angular_acceleration = (g*math.sin(angle)/length) - u*math.cos(angle)/length - (angular_damping*angular_velocity)
+            angle_error = angle_ref - angle
+            cart_velocity_error = cart_ref - xdot
+            angle_error_integral += angle_error * dt
+            cart_velocity_error_integral += cart_velocity_error * dt
+            angular_velocity += angular_acceleration * dt
+            angle += angular_velocity * dt
+            xdot += (u - cart_damping*xdot) * dt
+            x += xdot * dt
+            if angle < -math.pi:
+                angle += 2 * math.pi
+            elif angle > math.pi:
+                angle -= 2 * math.pi
+
+            # control
+            if enabled:
+                u_angle = - kp*angle_error + kd*angular_velocity - ki*angle_error_integral
+                u_cart = kp_cart*cart_velocity_error - kd_cart*u + ki_cart*cart_velocity_error_integral
+            else:
+                u_angle = 0.0
+                u_cart = 0.0
+            u = u_angle + u_cart
+
+            if record:
+                trajectory[step, i, 0] = angle
+                trajectory[step, i, 1] = angular_velocity
+                trajectory[step, i, 2] = x
+                trajectory[step, i, 3] = xdot
+                trajectory[step, i, 4] = u
+                trajectory[step, i, 5] = u_angle
+                trajectory[step, i, 6] = u_cart
+                trajectory[step, i, 7] = angle_error_integral
+                trajectory[step, i, 8] = cart_velocity_error_integral
+
+        state[i, 0] = angle
+        state[i, 1] = angular_velocity
+        state[i, 2] = x
+        state[i, 3] = xdot
+        state[i, 4] = u
+        state[i, 5] = u_angle
+        state[i, 6] = u_cart
+        state[i, 7] = angle_error_integral
+        state[i, 8] = cart_velocity_error_integral
+
+def _kernel_numpy(state, params, steps, trajectory, record):
+    # same loop vectorised over systems, used when Numba is unavailable
+    angle, angular_velocity, x, xdot, u, u_angle, u_cart, angle_error_integral, cart_velocity_error_integral = (
+        state.T.copy())
+    dt, g, length, angular_damping, cart_damping, angle_ref, cart_ref, kp, kd, ki, kp_cart, kd_cart, ki_cart, enabled = (
+        params.T)
+    angle_ref = np.deg2rad(angle_ref)
+    enabled = enabled != 0
+
+    for step in range(steps):
+        angular_acceleration = (g*np.sin(angle)/length) - u*np.cos(angle)/length - (angular_damping*angular_velocity)
+        angle_error = angle_ref - angle
+        cart_velocity_error = cart_ref - xdot
+        angle_error_integral += angle_error * dt
+        cart_velocity_error_integral += cart_velocity_error * dt
+        angular_velocity += angular_acceleration * dt
+        angle += angular_velocity * dt
+        xdot += (u - cart_damping*xdot) * dt
+        x += xdot * dt
+        np.add(angle, 2 * np.pi, out=angle, where=angle < -np.pi)
+        np.subtract(angle, 2 * np.pi, out=angle, where=angle > np.pi)
+
+        u_angle = np.where(enabled, - kp*angle_error + kd*angular_velocity - ki*angle_error_integral, 0.0)
+        u_cart = np.where(enabled, kp_cart*cart_velocity_error - kd_cart*u + ki_cart*cart_velocity_error_integral, 0.0)
+        u = u_angle + u_cart
+
+        if record:
+            trajectory[step] = np.stack((angle, angular_velocity, x, xdot, u, u_angle, u_cart,
+                    angle_error_integral, cart_velocity_error_integral), axis=1)
+
+    state[:] = np.stack((angle, angular_velocity, x, xdot, u, u_angle, u_cart,
+            angle_error_integral, cart_velocity_error_integral), axis=1)
+
+_compiled = None
+
+def numba_available():
+    """Returns True if the kernel can be compiled with Numba, compiling it on the first call."""
+    global _compiled
+    if _compiled is None:
+        try:
+            import numba
+            _compiled = numba.njit(cache=True)(_kernel)
+        except ImportError:
+            _compiled = False
+    return _compiled is not False
+
+def simulate(state, params, steps, trajectory=None, use_numba=None):
+    """
+    Advances every system in "state" by "steps" steps in place. If "trajectory" is given, an array of shape
+    (steps, n, len(STATE)), the state after every step is written to it. Numba is used when available
+    unless "use_numba" is False.
+    """
+    state = np.asarray(state, dtype=np.float64)
+    params = np.ascontiguousarray(params, dtype=np.float64)
+    if state.ndim != 2 or state.shape[1] != len(STATE) or params.shape != (state.shape[0], len(PARAMS)):
+        raise ValueError(f"state and params must have shapes (n, {len(STATE)}) and (n, {len(PARAMS)})")
+
+    record = trajectory is not None
+    if not record:
+        trajectory = np.empty((0, 0, 0))
+
+    if use_numba is not False and numba_available():
+        _compiled(state, params, steps, trajectory, record)
+    elif use_numba:
+        raise ImportError("Numba is not installed")
+    else:
+        _kernel_numpy(state, params, steps, trajectory, record)
+    return state
+
+def pack(pendulum, controller):
+    """Returns (state, params) arrays for a single Physics and Control pair."""
+    state = np.array([[getattr(controller if name.startswith('u') else pendulum, name) for name in STATE]],
+            dtype=np.float64)
+    params = np.array([[getattr(pendulum, name) for name in PHYSICS_PARAMS] +
+            [getattr(controller, name) for name in CONTROL_PARAMS]], dtype=np.float64)
+    return state, params
+
+def unpack(state, pendulum, controller):
+    """Copies a single row of state back into Physics and Control instances."""
+    for name, value in zip(STATE, state[0].tolist()):
+        setattr(controller if name.startswith('u') else pendulum, name, value)
@@ -0,0 +1,56 @@
+import functools
+import numpy as np
+
+"""
+Linear quadratic regulator for the pendulum on cart, an alternative to the PID controllers of Control.
+
+Physics is linearised about the upright equilibrium, with the state (angle, angular velocity, cart position,
+cart velocity) measured from the references:
+
+    angular acceleration = g/length * angle - angular_damping * angular velocity - u/length
+    cart acceleration    = u - cart_damping * cart velocity
+
+The continuous algebraic Riccati equation is solved with NumPy only, from the stable invariant subspace of
+the Hamiltonian matrix, and the resulting gains are cached for each set of plant parameters, so they are only
+recomputed when a parameter such as a damping slider changes.
+"""
+
+# attributes of Physics the linearisation depends on
+PLANT_PARAMETERS = ('g', 'length', 'angular_damping', 'cart_damping')
+
+def linearise(g, length, angular_damping, cart_damping):
+    """Returns the (A, B) matrices of the pendulum on cart linearised about the upright equilibrium."""
+    A = np.array([[0.0, 1.0, 0.0, 0.0],
+                  [g / length, -angular_damping, 0.0, 0.0],
+                  [0.0, 0.0, 0.0, 1.0],
+                  [0.0, 0.0, 0.0, -cart_damping]])
+    B = np.array([[0.0], [-1.0 / length], [0.0], [1.0]])
+    return A, B
+
+def solve_care(A, B, Q, R):
+    """
+    Returns the stabilising solution P of the continuous algebraic Riccati equation
+    A'P + PA - PBR^-1B'P + Q = 0, from the eigenvectors of the Hamiltonian matrix with negative real part.
+    """
+    n = A.shape[0]
+    R_inv = np.linalg.inv(R)
+    hamiltonian = np.block([[A, -B @ R_inv @ B.T], [-Q, -A.T]])
+    eigenvalues, eigenvectors = np.linalg.eig(hamiltonian)
+    stable = eigenvectors[:, eigenvalues.real < 0]
+    if stable.shape[1] != n:
+        raise np.linalg.LinAlgError("Riccati equation has no stabilising solution, is the plant controllable?")
+    P = np.real(stable[n:] @ np.linalg.inv(stable[:n]))
+    return (P + P.T) / 2
+
+@functools.lru_cache(maxsize=64)
+def lqr_gain(g, length, angular_damping, cart_damping, q=(100.0, 1.0, 1.0, 1.0), r=0.01):
+    """
+    Returns the state feedback gains K, as a tuple, minimising the integral of x'Qx + u'Ru for u = -Kx, with
+    Q = diag(q) weighting (angle, angular velocity, cart position, cart velocity) and R = r. Results are
+    cached, keyed on the arguments.
+    """
+    A, B = linearise(g, length, angular_damping, cart_damping)
+    R = np.array([[r]])
+    P = solve_care(A, B, np.diag(q), R)
+    K = np.linalg.solve(R, B.T @ P)
+    return tuple(K[0].tolist())
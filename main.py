@@ -1,33 +1,140 @@
-from PyQt6.QtWidgets import QApplication
-import matplotlib.animation as animation
+import argparse
 import sys
 
-from physics import Physics
-from controlpid import Control
-from visual import Visual
-from animations import Animations
-from controlpanel import ControlPanel
-from graphwindow import GraphWindow
-from pendulumwindow import PendulumWindow
-
 """
 Main file for inverted pendulum on cart simulation
+
+    python main.py                  opens the GUI
+    python main.py --headless ...   runs headless.py with the remaining arguments (see python headless.py --help)
+
+Qt, matplotlib and the GUI modules are only imported when the GUI is opened, so headless runs start quickly.
 """
 
-# initialising classes
-controller = Control()
-pendulum = Physics(controller.u)
-visualiser = Visual(pendulum)
-animate = Animations(pendulum, controller, visualiser)
-
-ctrl_panel = ControlPanel(pendulum, controller, visualiser, animate)
-graph = GraphWindow(visualiser)
-    
-# animations with 50 fps
-ani = animation.FuncAnimation(visualiser.fig, animate.animate_pendulum, frames=visualiser.frames, interval = 20, blit = True)
-ani_graph = animation.FuncAnimation(visualiser.graph_fig, animate.animate_graph, frames=visualiser.frames, interval = 20, blit = True)
-# start applicaiton
-app = QApplication(sys.argv)
-main_window = PendulumWindow(visualiser, graph, ctrl_panel)
-main_window.show()
-sys.exit(app.exec())
\ No newline at end of file
+def build_parser():
+    parser = argparse.ArgumentParser(description="Inverted pendulum on cart simulation")
+    parser.add_argument("--headless", action="store_true",
+            help="run without a GUI, passing all other arguments to headless.py")
+    parser.add_argument("--record", help="stream every simulated step to this recording file")
+    parser.add_argument("--replay", help="drive the animation and graph from a recording instead of live physics")
+    parser.add_argument("--replay-start", type=float, default=0.0, help="time in seconds to start the replay from")
+    parser.add_argument("--scenario", help="apply the timed events of this JSON (or YAML) scenario file to live physics")
+    parser.add_argument("--telemetry-port", type=int,
+            help="stream the live state to TCP clients on this port, see telemetryserver.py (0 picks a free port)")
+    parser.add_argument("--telemetry-host", default="127.0.0.1", help="address the telemetry server listens on")
+    parser.add_argument("--telemetry-decimation", type=int, default=1, help="stream every N-th step (default 1)")
+    simulator = parser.add_mutually_exclusive_group()
+    simulator.add_argument("--single-thread", action="store_true",
+            help="step the simulation in the render loop instead of a worker thread (always the case for replays)")
+    simulator.add_argument("--process", action="store_true",
+            help="run the simulation in a separate simulator process, attached through shared memory")
+    return parser
+
+def run_gui(args):
+    """Opens the GUI, returning the exit code of the application."""
+    import copy
+    from PyQt6.QtWidgets import QApplication
+
+    from physics import Physics
+    from controlpid import Control
+    from visual import Visual
+    from animations import Animations
+    from controlpanel import ControlPanel
+    from graphwindow import GraphWindow
+    from pendulumwindow import PendulumWindow
+    from recorder import Recorder, Replay
+    from renderloop import RenderLoop
+    from simulation import Simulation
+    from simthread import SimulationThread
+    from sharedstate import SimulatorProcess
+    from metrics import Metrics
+    from scenario import Scenario
+    from telemetryserver import TelemetryServer
+
+    # application created before any figure or widget, and reused by matplotlib
+    app = QApplication.instance() or QApplication(sys.argv)
+
+    # initialising classes
+    controller = Control()
+    pendulum = Physics(controller.u)
+    visualiser = Visual(pendulum)
+    animate = Animations(pendulum, controller, visualiser)
+
+    # replacing live physics with a recording, or streaming live physics to one
+    recorder = None
+    if args.replay:
+        animate.simulation = Replay(args.replay, pendulum, controller)
+        animate.simulation.metrics = Metrics(animate.simulation)
+        animate.simulation.seek(args.replay_start)
+    elif args.record and not args.process:
+        recorder = Recorder(args.record, pendulum.dt)
+        animate.simulation.recorder = recorder
+    if args.scenario and not args.replay:
+        animate.simulation.scenario = Scenario.load(args.scenario, pendulum.dt)
+    publisher = None
+    telemetry = None
+    if args.telemetry_port is not None and not args.replay:
+        telemetry = (args.telemetry_host, args.telemetry_port, args.telemetry_decimation)
+        if not args.process:
+            publisher = TelemetryServer(*telemetry)
+            publisher.start()
+            animate.simulation.publisher = publisher
+            print(f"streaming telemetry on {args.telemetry_host}:{publisher.port}")
+
+    ctrl_panel = ControlPanel(pendulum, controller, visualiser, animate)
+
+    # live physics stepped in a worker thread or a simulator process on its own copies of pendulum and controller,
+    # which the GUI ones mirror
+    sim_thread = None
+    if args.process and not args.replay:
+        # the simulator process writes its own recording
+        sim_thread = SimulatorProcess(pendulum, controller, record=args.record, scenario=args.scenario,
+                telemetry=telemetry)
+        animate.sim_thread = sim_thread
+        ctrl_panel.commands = sim_thread
+    elif not (args.replay or args.single_thread):
+        simulation = Simulation(copy.deepcopy(pendulum), copy.deepcopy(controller))
+        simulation.recorder, animate.simulation.recorder = recorder, None
+        simulation.scenario, animate.simulation.scenario = animate.simulation.scenario, None
+        simulation.publisher, animate.simulation.publisher = publisher, None
+        simulation.metrics = Metrics(simulation)
+        sim_thread = SimulationThread(simulation)
+        animate.sim_thread = sim_thread
+        ctrl_panel.commands = sim_thread
+
+    graph = GraphWindow(visualiser)
+
+    # start applicaiton
+    main_window = PendulumWindow(visualiser, graph, ctrl_panel)
+    main_window.show()
+
+    # one timer drives simulation and both canvases at 50 fps
+    render_loop = RenderLoop(animate, main_window, graph)
+    render_loop.start()
+    if sim_thread is not None:
+        sim_thread.start()
+    exit_code = app.exec()
+
+    if sim_thread is not None:
+        sim_thread.stop()
+
+    if recorder is not None:
+        recorder.close()
+    if publisher is not None:
+        publisher.stop()
+    return exit_code
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if "--headless" in argv:
+        # imported here so a headless run never loads Qt or matplotlib
+        import headless
+        headless.main([arg for arg in argv if arg != "--headless"])
+        return 0
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.telemetry_decimation < 1:
+        parser.error("--telemetry-decimation must be at least 1")
+    return run_gui(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import math
+import numpy as np
+
+"""
+Closed loop performance metrics of the pendulum controller, accumulated step by step while a simulation runs.
+
+Every metric is a running value updated in O(1) from the latest step, so a run of any length can be scored
+without storing its trajectory. Metrics compares the run of a single Simulation, BatchMetrics every pendulum
+of a BatchSimulation at once with NumPy arrays.
+"""
+
+# metrics reported by results, in order
+METRICS = ('settling_time', 'overshoot', 'rms_angle_error', 'peak_angle_error', 'peak_control', 'control_effort',
+           'max_cart_excursion', 'time_to_fall')
+
+# labels and units of the metrics, used by summary
+LABELS = {
+    'settling_time': ("settling time", "s"),
+    'overshoot': ("overshoot", "deg"),
+    'rms_angle_error': ("rms angle error", "deg"),
+    'peak_angle_error': ("peak angle error", "deg"),
+    'peak_control': ("peak |u|", ""),
+    'control_effort': ("integrated |u|", ""),
+    'max_cart_excursion': ("cart drift", ""),
+    'time_to_fall': ("time to fall", "s"),
+}
+
+def summary(results):
+    """Returns the metrics of a results dictionary as lines of text, with metrics never reached shown as '-'."""
+    lines = []
+    for name in METRICS:
+        label, unit = LABELS[name]
+        value = results[name]
+        text = f"{value:.2f} {unit}".rstrip() if math.isfinite(value) else "-"
+        lines.append(f"{label}: {text}")
+    return "\n".join(lines)
+
+class Metrics:
+
+    """
+    Streaming performance metrics of a Simulation (or Replay), updated after every step.
+
+
+    Attributes:
+    -----------
+    settle_band:
+        Angle error in radians within which the pendulum counts as settled
+    fall_angle:
+        Angle error in radians beyond which the pendulum counts as fallen
+    start_time, start_x:
+        Simulated time and cart position when the metrics were reset
+    side:
+        Sign of the angle error at reset, overshoot being an error of the opposite sign
+    steps:
+        Number of steps accumulated
+    last_outside:
+        Time since reset of the latest step outside the settle band
+    settled:
+        Boolean recording whether the latest step was inside the settle band
+    overshoot, sum_squared_error, peak_angle_error, peak_control, control_effort, max_cart_excursion, time_to_fall:
+        Running values of the metrics, angles in radians
+
+
+    Methods:
+    --------
+    reset(self, simulation):
+        Starts the metrics again from the current state of a simulation
+    update(self, simulation):
+        Accumulates the latest step of a simulation
+    results(self):
+        Returns the metrics as a dictionary (see METRICS), angles in degrees, with a settling time and time to
+        fall of infinity if not (yet) settled or fallen
+    values(self):
+        Returns the results as a tuple in METRICS order
+
+    """
+
+    def __init__(self, simulation, settle_band=2, fall_angle=90):
+
+        self.settle_band = math.radians(settle_band)
+        self.fall_angle = math.radians(fall_angle)
+        self.reset(simulation)
+
+    def reset(self, simulation):
+
+        pend = simulation.pendulum
+        error = pend.angle - math.radians(pend.angle_ref)
+        # math.remainder raises for an infinite angle
+        error = math.remainder(error, 2 * math.pi) if math.isfinite(error) else math.nan
+        self.start_time = simulation.t
+        self.start_x = pend.x
+        self.side = (error > 0) - (error < 0)
+
+        self.steps = 0
+        self.last_outside = 0
+        self.settled = abs(error) <= self.settle_band
+        self.overshoot = 0
+        self.sum_squared_error = 0
+        self.peak_angle_error = abs(error)
+        self.peak_control = 0
+        self.control_effort = 0
+        self.max_cart_excursion = 0
+        self.time_to_fall = math.inf
+
+    def update(self, simulation):
+
+        pend = simulation.pendulum
+        error = pend.angle - math.radians(pend.angle_ref)
+        elapsed = simulation.t - self.start_time
+
+        # a diverged (inf or NaN) state counts as fallen, and leaves the accumulated metrics as they were, as
+        # math.remainder raises for an infinite angle
+        if not math.isfinite(error):
+            self.settled = False
+            self.last_outside = elapsed
+            if self.time_to_fall == math.inf:
+                self.time_to_fall = elapsed
+            return
+
+        error = math.remainder(error, 2 * math.pi)
+        u = abs(simulation.controller.u)
+
+        # settling time is the end of the last excursion outside the band
+        self.settled = abs(error) <= self.settle_band
+        if not self.settled:
+            self.last_outside = elapsed
+        if abs(error) > self.fall_angle and self.time_to_fall == math.inf:
+            self.time_to_fall = elapsed
+
+        self.overshoot = max(self.overshoot, - self.side * error)
+        self.sum_squared_error += error * error
+        self.steps += 1
+        self.peak_angle_error = max(self.peak_angle_error, abs(error))
+        self.peak_control = max(self.peak_control, u)
+        self.control_effort += u * pend.dt
+        self.max_cart_excursion = max(self.max_cart_excursion, abs(pend.x - self.start_x))
+
+    def results(self):
+        return {
+            'settling_time': self.last_outside if self.settled else math.inf,
+            'overshoot': math.degrees(self.overshoot),
+            'rms_angle_error': math.degrees(math.sqrt(self.sum_squared_error / self.steps)) if self.steps else 0.0,
+            'peak_angle_error': math.degrees(self.peak_angle_error),
+            'peak_control': self.peak_control,
+            'control_effort': self.control_effort,
+            'max_cart_excursion': self.max_cart_excursion,
+            'time_to_fall': self.time_to_fall,
+        }
+
+    def values(self):
+        results = self.results()
+        return tuple(float(results[name]) for name in METRICS)
+
+class BatchMetrics:
+
+    """
+    Streaming performance metrics of every pendulum of a BatchSimulation, as Metrics with one array element
+    per pendulum.
+
+
+    Attributes:
+    -----------
+    As Metrics, with arrays in place of the running values
+
+
+    Methods:
+    --------
+    reset(self, simulation):
+        Starts the metrics again from the current state of a batch simulation
+    update(self, simulation):
+        Accumulates the latest step of every pendulum of a batch simulation
+    results(self):
+        Returns the metrics as a dictionary of arrays (see METRICS), as Metrics.results
+
+    """
+
+    def __init__(self, simulation, settle_band=2, fall_angle=90):
+
+        self.settle_band = np.deg2rad(settle_band)
+        self.fall_angle = np.deg2rad(fall_angle)
+        self.reset(simulation)
+
+    def _errors(self, pendulums):
+        # angle errors wrapped to [-pi, pi)
+        return (pendulums.angle - np.deg2rad(pendulums.angle_ref) + np.pi) % (2 * np.pi) - np.pi
+
+    def reset(self, simulation):
+
+        pendulums = simulation.pendulums
+        error = self._errors(pendulums)
+        n = len(error)
+        self.start_time = simulation.t
+        self.start_x = pendulums.x.copy()
+        self.side = np.sign(error)
+
+        self.steps = 0
+        self.last_outside = np.zeros(n)
+        self.settled = np.abs(error) <= self.settle_band
+        self.overshoot = np.zeros(n)
+        self.sum_squared_error = np.zeros(n)
+        self.peak_angle_error = np.abs(error)
+        self.peak_control = np.zeros(n)
+        self.control_effort = np.zeros(n)
+        self.max_cart_excursion = np.zeros(n)
+        self.time_to_fall = np.full(n, np.inf)
+
+    def update(self, simulation):
+
+        pendulums = simulation.pendulums
+        error = self._errors(pendulums)
+        elapsed = simulation.t - self.start_time
+        u = np.abs(simulation.controllers.u)
+
+        np.less_equal(np.abs(error), self.settle_band, out=self.settled)
+        self.last_outside[~self.settled] = elapsed
+        self.time_to_fall[~(np.abs(error) <= self.fall_angle) & np.isinf(self.time_to_fall)] = elapsed
+
+        np.maximum(self.overshoot, - self.side * error, out=self.overshoot)
+        self.sum_squared_error += error * error
+        self.steps += 1
+        np.maximum(self.peak_angle_error, np.abs(error), out=self.peak_angle_error)
+        np.maximum(self.peak_control, u, out=self.peak_control)
+        self.control_effort += u * pendulums.dt
+        np.maximum(self.max_cart_excursion, np.abs(pendulums.x - self.start_x), out=self.max_cart_excursion)
+
+    def results(self):
+        return {
+            'settling_time': np.where(self.settled, self.last_outside, np.inf),
+            'overshoot': np.rad2deg(self.overshoot),
+            'rms_angle_error': np.rad2deg(np.sqrt(self.sum_squared_error / max(self.steps, 1))),
+            'peak_angle_error': np.rad2deg(self.peak_angle_error),
+            'peak_control': self.peak_control.copy(),
+            'control_effort': self.control_effort.copy(),
+            'max_cart_excursion': self.max_cart_excursion.copy(),
+            'time_to_fall': self.time_to_fall.copy(),
+        }
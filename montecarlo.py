@@ -0,0 +1,213 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from controlpid import Control
+from batchphysics import BatchPhysics
+from batchcontrol import BatchControl
+from simulation import BatchSimulation
+from metrics import BatchMetrics, METRICS
+from gainsweep import GAINS
+
+"""
+Monte Carlo robustness study of the default PID gains of Control. Samples the plant parameters of Physics
+from distributions covering the hardware tolerances, simulates every sample with vectorised batches across a
+process pool, and reports the success rate, histograms of the peak angle error and of the failure rate against
+each parameter, and percentiles of the performance metrics of metrics.py.
+
+Samples are simulated in chunks, each drawn and stepped as one batch by a worker and reduced to one record of
+parameters and metrics per sample, so memory is bounded by the chunk size however many steps are simulated.
+"""
+
+# plant parameters sampled, init_angle in degrees, and their default distributions
+PARAMETERS = ('length', 'angular_damping', 'cart_damping', 'init_angle')
+DISTRIBUTIONS = {
+    'length': ('normal', 15.0, 0.5),
+    'angular_damping': ('uniform', 0.05, 0.15),
+    'cart_damping': ('uniform', 0.25, 0.75),
+    'init_angle': ('uniform', -30.0, 30.0),
+}
+# distributions are methods of numpy.random.Generator, taking their arguments in order, or a fixed value
+KINDS = ('fixed', 'normal', 'uniform', 'lognormal', 'triangular')
+
+# results kept per sample, in single precision so 10^6 samples fit in tens of megabytes
+RESULT_DTYPE = np.dtype([(name, np.float32) for name in PARAMETERS] + [('success', np.bool_)] +
+                        [(name, np.float32) for name in METRICS])
+
+PERCENTILES = (5, 50, 95, 99)
+
+def sample(rng, distributions, n):
+    """Returns a dictionary of n samples of every parameter in PARAMETERS drawn from "distributions"."""
+    samples = {}
+    for name in PARAMETERS:
+        kind, *args = distributions.get(name, DISTRIBUTIONS[name])
+        if kind not in KINDS:
+            raise ValueError(f"Unknown distribution {kind!r} for {name}, expected one of {', '.join(KINDS)}")
+        if kind == 'fixed':
+            samples[name] = np.full(n, float(args[0]))
+        else:
+            samples[name] = getattr(rng, kind)(*args, size=n)
+
+    # physical limits, so tails of e.g. normal distributions don't give a negative length or damping
+    samples['length'] = np.maximum(samples['length'], 1e-3)
+    samples['angular_damping'] = np.maximum(samples['angular_damping'], 0)
+    samples['cart_damping'] = np.maximum(samples['cart_damping'], 0)
+    return samples
+
+def run_chunk(seed, n, distributions, steps, dt=0.03, band=45, settle_band=2):
+    """
+    Draws n samples with the seed sequence "seed" and simulates them as one batch with the default gains of
+    Control, returning one record (RESULT_DTYPE) per sample. A sample succeeds if its angle error never
+    leaves "band" degrees.
+    """
+    samples = sample(np.random.default_rng(seed), distributions, n)
+
+    pendulums = BatchPhysics(n)
+    pendulums.dt = dt
+    pendulums.length = samples['length']
+    pendulums.angular_damping = samples['angular_damping']
+    pendulums.cart_damping = samples['cart_damping']
+    pendulums.init_angle[:] = np.deg2rad(samples['init_angle'])
+    pendulums.reset()
+
+    controllers = BatchControl(n)
+    defaults = Control()
+    for name in GAINS:
+        setattr(controllers, name, np.full(n, float(getattr(defaults, name))))
+    controllers.controller_enabled[:] = True
+
+    simulation = BatchSimulation(pendulums, controllers)
+    simulation.metrics = BatchMetrics(simulation, settle_band, fall_angle=band)
+    # samples far outside the stable range may diverge to inf and NaN, which count as failures
+    with np.errstate(all='ignore'):
+        for i in range(steps):
+            simulation.step()
+
+        results = np.empty(n, dtype=RESULT_DTYPE)
+        for name in PARAMETERS:
+            results[name] = samples[name]
+        for name, values in simulation.metrics.results().items():
+            results[name] = values
+    # time to fall is the first step beyond the band
+    results['success'] = np.isinf(results['time_to_fall'])
+    return results
+
+def run(samples, distributions=None, duration=10, dt=0.03, band=45, settle_band=2, seed=None, workers=None,
+        chunk_size=4096):
+    """
+    Simulates "samples" draws of the plant parameters across a process pool in chunks of "chunk_size", returning
+    a structured array with one record (RESULT_DTYPE) per sample. Each chunk has its own child of the seed
+    sequence, so results only depend on the seed and chunk size, not the number of workers.
+    """
+    distributions = distributions or {}
+    sample(np.random.default_rng(), distributions, 0) # bad distributions fail here rather than in every worker
+    workers = workers or os.cpu_count()
+    steps = int(round(duration / dt))
+
+    sizes = [min(chunk_size, samples - start) for start in range(0, samples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    results = np.empty(samples, dtype=RESULT_DTYPE)
+
+    if workers == 1:
+        chunks = (run_chunk(seed, n, distributions, steps, dt, band, settle_band) for seed, n in zip(seeds, sizes))
+        for start, chunk in zip(range(0, samples, chunk_size), chunks):
+            results[start:start + len(chunk)] = chunk
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(run_chunk, seeds, sizes, [distributions] * len(sizes), [steps] * len(sizes),
+                [dt] * len(sizes), [band] * len(sizes), [settle_band] * len(sizes))
+        # chunks are copied into place as they arrive, so only a few are held at once
+        for start, chunk in zip(range(0, samples, chunk_size), chunks):
+            results[start:start + len(chunk)] = chunk
+    return results
+
+def failure_histograms(results, bins=10):
+    """
+    Returns a dictionary mapping each parameter in PARAMETERS to (edges, samples, failures), the histograms of
+    all samples and of failed samples over the range of that parameter, from which failure rates follow.
+    """
+    histograms = {}
+    failed = ~results['success']
+    for name in PARAMETERS:
+        values = results[name].astype(np.float64)
+        edges = np.histogram_bin_edges(values, bins=bins)
+        histograms[name] = (edges, np.histogram(values, edges)[0], np.histogram(values[failed], edges)[0])
+    return histograms
+
+def percentiles(results, levels=PERCENTILES):
+    """
+    Returns a dictionary mapping each metric to its percentiles at "levels" over the samples where it is finite,
+    with the fraction of samples it is finite for (e.g. the settled fraction for settling_time).
+    """
+    summary = {}
+    for name in METRICS:
+        values = results[name].astype(np.float64)
+        finite = values[np.isfinite(values)]
+        summary[name] = ((np.percentile(finite, levels) if len(finite) else np.full(len(levels), np.nan)),
+                         len(finite) / max(len(values), 1))
+    return summary
+
+def report(results, band=45, bins=10):
+    """Returns a text report of success rate, peak angle error histogram, failure rates and metric percentiles."""
+    lines = [f"{len(results)} samples, success rate {results['success'].mean():.2%} (angle error within {band:g} deg)"]
+
+    lines.append("\npeak angle error (deg):")
+    counts, edges = np.histogram(results['peak_angle_error'], bins=np.linspace(0, 180, 19))
+    for count, low, high in zip(counts, edges[:-1], edges[1:]):
+        lines.append(f"  {low:5.0f} - {high:3.0f}  {count:9d}")
+
+    for name, (edges, samples, failures) in failure_histograms(results, bins).items():
+        lines.append(f"\nfailure rate by {name}:")
+        for low, high, total, failed in zip(edges[:-1], edges[1:], samples, failures):
+            rate = f"{failed / total:7.2%}" if total else "      -"
+            lines.append(f"  {low:9.4g} - {high:<9.4g} {rate}  of {total}")
+
+    lines.append("\nmetric percentiles (" + ", ".join(f"p{p}" for p in PERCENTILES) + "), over finite values:")
+    for name, (values, fraction) in percentiles(results).items():
+        lines.append(f"  {name:20s} " + "  ".join(f"{value:9.3f}" for value in values) + f"  ({fraction:.1%} finite)")
+    return "\n".join(lines)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo robustness of the default PID gains to plant tolerances")
+    parser.add_argument("--samples", type=int, default=100000, help="number of samples (default 100000)")
+    for name in PARAMETERS:
+        kind, *args = DISTRIBUTIONS[name]
+        parser.add_argument("--" + name.replace('_', '-'), nargs='+', metavar=("KIND", "ARG"),
+                help=f"distribution of {name}, one of {', '.join(KINDS)} and its arguments "
+                     f"(default {kind} {' '.join(f'{arg:g}' for arg in args)})")
+    parser.add_argument("--duration", type=float, default=10.0, help="simulated time per sample in seconds")
+    parser.add_argument("--dt", type=float, default=0.03, help="time step in seconds")
+    parser.add_argument("--band", type=float, default=45.0,
+            help="angle error in degrees a successful sample never leaves (default 45)")
+    parser.add_argument("--seed", type=int, help="seed of the random samples")
+    parser.add_argument("--workers", type=int, help="number of worker processes (default all cores)")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="samples simulated per vectorised batch")
+    parser.add_argument("--output", help="save per sample results to this .npz file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    distributions = {}
+    for name in PARAMETERS:
+        spec = getattr(args, name)
+        if spec is not None:
+            distributions[name] = (spec[0],) + tuple(float(arg) for arg in spec[1:])
+
+    start = time.perf_counter()
+    results = run(args.samples, distributions, args.duration, args.dt, args.band, seed=args.seed,
+            workers=args.workers, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+
+    print(f"simulated in {elapsed:.2f} s")
+    print(report(results, args.band))
+    if args.output:
+        np.savez_compressed(args.output, **{name: results[name] for name in results.dtype.names})
+        print(f"results saved to {args.output}")
+
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
+import math
 import numpy as np
+from integrators import SemiImplicitEuler
 
 class Physics:
 
@@ -21,7 +23,9 @@ class Physics:
     x:
         position of the cart
     dt:
-        Time interval used for Euler integration
+        Time interval of each step
+    integrator:
+        Integrator used to advance the state by dt each step, semi-implicit Euler by default (see integrators.py)
     g:
         Acceleration due to gravity
     length:
@@ -53,8 +57,16 @@ class Physics:
     compute(self, u):
         Updates angular acceleration, angular velocity, angle, cart velocity (xdot), cart position (x)
         and errors, aswell as limiting the angle of the pendulum to [-180, 180]
-    pendulum_pos(self, theta):
-        Returns x, y coordinates of pendulum from angle, cart position (x), and length of the pendulum
+    derivatives(self, state, u):
+        Returns time derivatives of a state (angle, angular velocity, x, xdot, angle error integral,
+        cart velocity error integral) for control input u, used by the integrators
+    get_state(self):
+        Returns the state integrated by the integrators as an array
+    set_state(self, state):
+        Sets the state integrated by the integrators from an array
+    pendulum_pos(self, theta, x=None):
+        Returns x, y coordinates of pendulum from angle, cart position (x, defaults to current position),
+        and length of the pendulum
     add_velocity(self, add_v):
         Adds parameter "add_v" to angular angular velocity, connected to a button
     set_angle(self, angle_in):
@@ -62,15 +74,23 @@ class Physics:
 
     """
 
+    # fixed attributes stored in slots rather than a per instance dict, so the state is compact and setting an
+    # unknown attribute is an error
+    __slots__ = ('angle', 'angular_velocity', 'angular_acceleration', 'u', 'xdot', 'x', 'dt', 'integrator',
+                 'g', 'length', 'angular_damping', 'cart_damping', 'angle_error_integral', 'angle_error',
+                 'cart_velocity_error', 'cart_velocity_error_integral', 'cart_ref', 'angle_ref',
+                 'graph_visibility', 'init_angle')
+
     def __init__(self, u):
         
-        self.angle = np.deg2rad(-20)
+        self.angle = math.radians(-20)
         self.angular_velocity = 0
         self.angular_acceleration = 0
         self.u = u # control input
         self.xdot = 0
         self.x = 0
         self.dt = 0.03
+        self.integrator = SemiImplicitEuler()
 
         self.g = 9.81
         self.length = 15
@@ -86,26 +106,28 @@ class Physics:
         self.angle_ref = 0
 
         self.graph_visibility = False
-        self.init_angle = np.deg2rad(-20)
+        self.init_angle = math.radians(-20)
 
         
     def compute(self, u):
 
+        # math functions on Python floats, as NumPy functions would box every result in a new NumPy scalar.
+        # math raises for an infinite angle, so a diverged state gives NaN as NumPy would instead
+        if math.isfinite(self.angle):
+            sin_angle = math.sin(self.angle)
+            cos_angle = math.cos(self.angle)
+        else:
+            sin_angle = cos_angle = math.nan
         self.angular_acceleration = ( 
-            (self.g*np.sin(self.angle)/self.length) 
-            - u*np.cos(self.angle)/self.length 
+            (self.g*sin_angle/self.length) 
+            - u*cos_angle/self.length 
             - (self.angular_damping * self.angular_velocity) )
 
-        self.angle_error = np.deg2rad(self.angle_ref) - self.angle
+        self.angle_error = math.radians(self.angle_ref) - self.angle
         self.cart_velocity_error = self.cart_ref - self.xdot
 
-        # Euler integration
-        self.angle_error_integral += self.angle_error * self.dt
-        self.cart_velocity_error_integral += self.cart_velocity_error * self.dt
-        self.angular_velocity += self.angular_acceleration * self.dt
-        self.angle += self.angular_velocity * self.dt
-        self.xdot += (u - self.cart_damping*self.xdot) * self.dt
-        self.x += self.xdot*self.dt
+        # integration of state over dt
+        self.integrator.step(self, u)
 
         # limiting angle
         if self.angle < - np.pi:
@@ -115,11 +137,32 @@ class Physics:
             self.angle -= 2* np.pi
             
     
-    def pendulum_pos(self, theta): # returns x & y coordinates as function of theta (polar)
-        return (self.x + self.length*np.sin(theta), self.length*np.cos(theta)) 
+    def derivatives(self, state, u):
+        angle, angular_velocity, x, xdot, angle_error_integral, cart_velocity_error_integral = state
+        angular_acceleration = (
+            (self.g*np.sin(angle)/self.length)
+            - u*np.cos(angle)/self.length
+            - (self.angular_damping * angular_velocity) )
+        return np.array([angular_velocity, angular_acceleration, xdot, u - self.cart_damping*xdot,
+                np.deg2rad(self.angle_ref) - angle, self.cart_ref - xdot])
+
+    def get_state(self):
+        return np.array([self.angle, self.angular_velocity, self.x, self.xdot,
+                self.angle_error_integral, self.cart_velocity_error_integral])
+
+    def set_state(self, state):
+        (self.angle, self.angular_velocity, self.x, self.xdot,
+                self.angle_error_integral, self.cart_velocity_error_integral) = state.tolist()
+
+    def pendulum_pos(self, theta, x=None): # returns x & y coordinates as function of theta (polar)
+        if x is None:
+            x = self.x
+        if not math.isfinite(theta):
+            return (math.nan, math.nan)
+        return (x + self.length*math.sin(theta), self.length*math.cos(theta)) 
     
     def add_velocity(self, add_v):
         self.angular_velocity += add_v
 
     def set_angle(self, angle_in):
-        self.angle = np.deg2rad(angle_in)
+        self.angle = math.radians(angle_in)
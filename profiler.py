@@ -0,0 +1,82 @@
+import time
+import numpy as np
+
+class FrameProfiler:
+
+    """
+    Low overhead timing of the stages of each animation frame.
+    Each stage keeps its latest samples in a fixed size ring, from which rolling statistics are computed
+    on demand, so recording a sample is a single array write and memory does not grow. Callers check
+    "enabled" before timing anything, so a disabled profiler costs one attribute check per stage.
+
+
+    Attributes:
+    -----------
+    enabled:
+        Boolean used to turn profiling on / off at runtime
+    show_hud:
+        Boolean used to show / hide the performance overlay on the pendulum figure
+    window:
+        Number of latest samples kept per stage
+    samples:
+        Dictionary of stage name to ring array of samples
+    counts:
+        Dictionary of stage name to number of samples recorded
+    clock:
+        Function returning time in seconds used for timing
+
+
+    Methods:
+    --------
+    record(self, stage, value):
+        Adds a sample (a duration in seconds, or a count such as steps per frame) to a stage
+    stats(self, stage):
+        Returns count, mean, p50, p90, p99 and max of the samples of a stage in the rolling window
+    summary(self):
+        Returns stats of every stage as a dictionary
+    hud_text(self):
+        Returns a short text of frame time and simulation rate for the performance overlay
+    reset(self):
+        Removes all samples
+
+    """
+
+    def __init__(self, window=256):
+
+        self.enabled = False
+        self.show_hud = False
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+        self.clock = time.perf_counter
+
+    def record(self, stage, value):
+        count = self.counts.get(stage, 0)
+        if count == 0:
+            self.samples[stage] = np.zeros(self.window)
+        self.samples[stage][count % self.window] = value
+        self.counts[stage] = count + 1
+
+    def stats(self, stage):
+        count = self.counts.get(stage, 0)
+        if count == 0:
+            return {'count': 0, 'mean': np.nan, 'p50': np.nan, 'p90': np.nan, 'p99': np.nan, 'max': np.nan}
+        values = self.samples[stage][:min(count, self.window)]
+        p50, p90, p99 = np.percentile(values, (50, 90, 99))
+        return {'count': count, 'mean': values.mean(), 'p50': p50, 'p90': p90, 'p99': p99, 'max': values.max()}
+
+    def summary(self):
+        return {stage: self.stats(stage) for stage in self.samples}
+
+    def hud_text(self):
+        interval = self.stats('frame_interval')
+        frame = self.stats('frame')
+        steps = self.stats('steps')
+        if interval['count'] == 0:
+            return ''
+        return (f"{1 / interval['mean']:.0f} fps  frame {1000 * frame['p50']:.2f} ms (p99 {1000 * frame['p99']:.2f})\n"
+                f"sim {steps['mean'] / interval['mean']:,.0f} steps/s")
+
+    def reset(self):
+        self.samples.clear()
+        self.counts.clear()
@@ -0,0 +1,171 @@
+import os
+import struct
+import numpy as np
+
+from simulation import TRAJECTORY_DTYPE, load_sample
+
+"""
+Recording of simulation runs to append-only binary files, and replay of recordings.
+
+A recording is a 24 byte header (magic, version, record size, dt) followed by one TRAJECTORY_DTYPE record
+per step. Records are only ever appended, so a recording can be read back with np.memmap while it is
+still being written, and files of any size are read without loading them into memory.
+"""
+
+MAGIC = b'PENDREC\x00'
+VERSION = 1
+HEADER = struct.Struct('<8sIId') # magic, version, record size, dt
+
+class Recorder:
+
+    """
+    Streams every step of a simulation to a recording file.
+
+
+    Attributes:
+    -----------
+    path:
+        Path of the recording file
+    dt:
+        Time step of the recorded simulation, stored in the header
+    buffer:
+        Preallocated records written to the file in blocks, so each step costs no file write
+    count:
+        Number of records in buffer not yet written
+
+
+    Methods:
+    --------
+    record(self, simulation):
+        Appends the current state of a Simulation instance
+    flush(self):
+        Writes buffered records to the file
+    close(self):
+        Flushes and closes the file
+
+    """
+
+    def __init__(self, path, dt, buffer_size=4096):
+
+        self.path = path
+        self.dt = dt
+        self.buffer = np.zeros(buffer_size, dtype=TRAJECTORY_DTYPE)
+        self.count = 0
+
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, VERSION, TRAJECTORY_DTYPE.itemsize, dt))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def record(self, simulation):
+        self.buffer[self.count] = simulation.sample()
+        self.count += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.buffer[:self.count].tobytes())
+        self.file.flush()
+        self.count = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+def load_recording(path):
+    """
+    Returns (records, dt) of a recording, records being a read only np.memmap of TRAJECTORY_DTYPE.
+    A partly written final record, e.g. from a run that was killed, is ignored.
+    """
+    with open(path, 'rb') as file:
+        magic, version, record_size, dt = HEADER.unpack(file.read(HEADER.size))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a pendulum recording")
+    if version != VERSION or record_size != TRAJECTORY_DTYPE.itemsize:
+        raise ValueError(f"{path} has unsupported version {version} or record size {record_size}")
+
+    count = (os.path.getsize(path) - HEADER.size) // record_size
+    if count == 0:
+        return np.zeros(0, dtype=TRAJECTORY_DTYPE), dt
+    records = np.memmap(path, dtype=TRAJECTORY_DTYPE, mode='r', offset=HEADER.size, shape=(count,))
+    return records, dt
+
+class Replay:
+
+    """
+    Replays a recording in place of a Simulation, copying one record per step into Physics and Control
+    instances so the animation and graph are driven exactly as by the live simulation.
+
+
+    Attributes:
+    -----------
+    pendulum:
+        Instance of Physics class the recorded state is copied into
+    controller:
+        Instance of Control class the recorded control inputs are copied into
+    records:
+        Memory mapped records of the recording
+    index:
+        Index of the next record to replay
+    t:
+        Recorded time of the last replayed record
+    manual_input:
+        Unused, present so Replay can be stepped like Simulation
+    finished:
+        Boolean recording whether the end of the recording has been reached
+    metrics:
+        Instance of Metrics class updated with every replayed record, or None
+
+
+    Methods:
+    --------
+    step(self):
+        Copies the next record into pendulum and controller, holding the last record at the end
+    seek(self, t):
+        Moves to the first record at or after time t, for scrubbing through a recording, starting the metrics
+        again from there
+    apply(self, name, *args):
+        Ignores commands from the GUI, as a recording can't be changed
+
+    """
+
+    def __init__(self, path, pendulum, controller):
+
+        self.records, dt = load_recording(path)
+        self.pendulum = pendulum
+        self.controller = controller
+        self.pendulum.dt = dt
+
+        self.index = 0
+        self.t = 0
+        self.manual_input = 0
+        self.finished = len(self.records) == 0
+        self.metrics = None
+
+    def step(self):
+
+        if self.index >= len(self.records):
+            self.finished = True
+            return
+
+        record = self.records[self.index]
+        self.index += 1
+        self.t = load_sample(record, self.pendulum, self.controller)
+        if self.metrics is not None:
+            self.metrics.update(self)
+
+    def seek(self, t):
+        # binary search of the time column only touches a few pages of the file
+        self.index = int(np.searchsorted(self.records['t'], t))
+        self.finished = False
+        self.step()
+        if self.metrics is not None:
+            self.metrics.reset(self)
+
+    def apply(self, name, *args):
+        pass
@@ -0,0 +1,163 @@
+from PyQt6.QtCore import QTimer, Qt
+
+"""
+Single timer render loop driving the pendulum and graph canvases.
+
+One tick advances the simulation once, then redraws only the canvases whose windows are visible, blitting
+the animated artists over a cached background. Telemetry is recorded on every tick whether or not the graph
+is shown, so the history is complete when the graph window is opened.
+"""
+
+class Blitter:
+
+    """
+    Blitting of a set of animated artists onto a canvas over a cached background.
+
+
+    Attributes:
+    -----------
+    canvas:
+        Matplotlib canvas the artists are drawn on
+    artists:
+        Artists redrawn every frame, marked animated so full draws leave them out of the background
+    background:
+        Saved canvas region without the artists, None until the first full draw
+    view_limits:
+        View limits of the axes at the last full draw, a change of which requires a full draw
+
+
+    Methods:
+    --------
+    on_draw(self, event):
+        Saves the background after every full draw (e.g. resize, axes limits change) and draws the artists on it
+    blit(self):
+        Restores the background, draws the artists and blits the axes to the screen
+
+    """
+
+    def __init__(self, canvas, artists):
+
+        self.canvas = canvas
+        self.artists = artists
+        self.axes = list(dict.fromkeys(artist.axes for artist in artists))
+        self.background = None
+        self.view_limits = None
+
+        for artist in artists:
+            artist.set_animated(True)
+        canvas.mpl_connect('draw_event', self.on_draw)
+
+    def _view_limits(self):
+        return [tuple(ax.viewLim.bounds) for ax in self.axes]
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self.view_limits = self._view_limits()
+        for artist in self.artists:
+            self.canvas.figure.draw_artist(artist)
+
+    def blit(self):
+        # axes limits changed since the background was saved, e.g. the rolling graph time axis
+        if self.background is None or self._view_limits() != self.view_limits:
+            self.canvas.draw()
+            return
+
+        self.canvas.restore_region(self.background)
+        for artist in self.artists:
+            self.canvas.figure.draw_artist(artist)
+        self.canvas.blit(self.canvas.figure.bbox)
+
+class RenderLoop:
+
+    """
+    Drives the simulation and both canvases from one QTimer, replacing one FuncAnimation per figure.
+
+
+    Attributes:
+    -----------
+    animate:
+        Instance of Animations class
+    pendulum_window:
+        Instance of PendulumWindow class
+    graph:
+        Instance of GraphWindow class
+    pendulum_blitter, graph_blitter:
+        Blitter instances of the pendulum and graph canvases
+    timer:
+        QTimer calling tick every interval milliseconds
+    metrics_countdown:
+        Ticks until the metrics of the control panel are next refreshed
+
+
+    Methods:
+    --------
+    start(self):
+        Starts the timer
+    stop(self):
+        Stops the timer
+    tick(self):
+        Advances the simulation and redraws the visible canvases, refreshing the metrics of the control panel a
+        few times a second while it is shown
+
+    """
+
+    def __init__(self, animate, pendulum_window, graph, interval=20):
+
+        self.animate = animate
+        self.pendulum_window = pendulum_window
+        self.graph = graph
+
+        visualiser = animate.visualiser
+        self.pendulum_blitter = Blitter(pendulum_window.canvas, [visualiser.line, visualiser.circle, visualiser.cart,
+                visualiser.leftwheel, visualiser.rightwheel, visualiser.angle_label, visualiser.perf_label])
+        self.graph_blitter = Blitter(graph.canvas, [visualiser.theta, visualiser.theta_dot, visualiser.x_cart,
+                visualiser.x_dot, visualiser.u_plot])
+
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.tick)
+        self.metrics_countdown = 0
+
+    def start(self):
+        self.timer.start()
+
+    def stop(self):
+        self.timer.stop()
+
+    def tick(self):
+
+        animate = self.animate
+        profiler = animate.profiler
+        if profiler.enabled:
+            frame_start = profiler.clock()
+
+        animate.step_simulation()
+        animate.record_graph()
+
+        # canvases of hidden or minimised windows are not drawn
+        if self.pendulum_window.isVisible() and not self.pendulum_window.isMinimized():
+            animate.draw_pendulum()
+            if profiler.enabled:
+                blit_start = profiler.clock()
+            self.pendulum_blitter.blit()
+            if profiler.enabled:
+                profiler.record('blit_pendulum', profiler.clock() - blit_start)
+
+        if self.graph.isVisible() and not self.graph.isMinimized():
+            animate.draw_graph()
+            if profiler.enabled:
+                blit_start = profiler.clock()
+            self.graph_blitter.blit()
+            if profiler.enabled:
+                profiler.record('blit_graph', profiler.clock() - blit_start)
+
+        ctrl_panel = self.pendulum_window.ctrl_panel
+        if ctrl_panel.isVisible():
+            self.metrics_countdown -= 1
+            if self.metrics_countdown <= 0:
+                ctrl_panel.show_metrics(animate.metrics_results())
+                self.metrics_countdown = 10
+
+        if profiler.enabled:
+            profiler.record('frame', profiler.clock() - frame_start)
@@ -0,0 +1,165 @@
+import json
+import sys
+import numpy as np
+
+"""
+Scripted scenarios of timed disturbances and parameter changes, for repeatable runs.
+
+A scenario file (JSON, or YAML with PyYAML installed) lists events, each with a time "t" in seconds and a
+"type":
+
+    {"t": 1.0, "type": "impulse", "value": 0.5}                       adds to the angular velocity
+    {"t": 2.0, "type": "set_angle", "value": 10}                       sets the angle in degrees
+    {"t": 3.0, "type": "force", "value": 50, "duration": 0.5}          cart acceleration held for a duration
+    {"t": 3.0, "type": "force", "profile": [[0, 20], [0.5, -20], [1, 0]]}
+                                                                       piecewise constant cart acceleration, given
+                                                                       as [time after t, value] pairs
+    {"t": 4.0, "type": "angle_ref", "value": 5}                        reference angle in degrees
+    {"t": 4.0, "type": "cart_ref", "value": 1}                         reference cart velocity
+    {"t": 5.0, "type": "gain", "name": "kp", "value": 80}              sets a gain of Control
+    {"t": 6.0, "type": "controller", "value": true}                    enables / disables the controller
+
+Events are compiled for the dt of the simulation into an array of Simulation.apply commands sorted by the step
+they apply before, so each step only compares its step count with that of the next event. Scenarios are
+driven by steps rather than wall clock time, so a scenario runs identically headless and in the GUI.
+"""
+
+# commands of Simulation.apply, targets of the 'set' command and attributes set, stored by index
+COMMANDS = ('add_velocity', 'set_angle', 'set')
+TARGETS = ('simulation', 'pendulum', 'controller')
+GAINS = ('kp', 'kd', 'ki', 'kp_cart', 'kd_cart', 'ki_cart')
+ATTRIBUTES = ('', 'manual_input', 'angle_ref', 'cart_ref', 'controller_enabled') + GAINS
+
+EVENT_DTYPE = np.dtype([
+    ('step', np.int64),
+    ('command', np.uint8),
+    ('target', np.uint8),
+    ('attribute', np.uint8),
+    ('value', np.float64),
+])
+
+def load_scenario_file(path):
+    """Returns the description (a dictionary with a list of "events") of a JSON or YAML scenario file."""
+    with open(path) as file:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("YAML scenarios need PyYAML installed, or can be written as JSON") from None
+            return yaml.safe_load(file)
+        return json.load(file)
+
+def compile_events(events, dt):
+    """
+    Returns the events of a scenario description as an array of EVENT_DTYPE sorted by step, events at the same
+    step keeping the order of the file. Raises ValueError for an unknown or incomplete event.
+    """
+    compiled = []
+
+    def add(t, command, target='simulation', attribute='', value=0.0):
+        step = int(round(t / dt))
+        if step < 0:
+            raise ValueError(f"Event at t={t} is before the start of the scenario")
+        compiled.append((step, COMMANDS.index(command), TARGETS.index(target), ATTRIBUTES.index(attribute),
+                         float(value)))
+
+    for event in events:
+        try:
+            t, kind = float(event['t']), event['type']
+            if kind == 'impulse':
+                add(t, 'add_velocity', value=event['value'])
+            elif kind == 'set_angle':
+                add(t, 'set_angle', value=event['value'])
+            elif kind == 'force':
+                if 'profile' in event:
+                    for offset, value in event['profile']:
+                        add(t + float(offset), 'set', 'simulation', 'manual_input', value)
+                else:
+                    add(t, 'set', 'simulation', 'manual_input', event['value'])
+                    if 'duration' in event:
+                        add(t + float(event['duration']), 'set', 'simulation', 'manual_input', 0.0)
+            elif kind in ('angle_ref', 'cart_ref'):
+                add(t, 'set', 'pendulum', kind, event['value'])
+            elif kind == 'gain':
+                if event['name'] not in GAINS:
+                    raise ValueError(f"Unknown gain {event['name']!r}, expected one of {', '.join(GAINS)}")
+                add(t, 'set', 'controller', event['name'], event['value'])
+            elif kind == 'controller':
+                add(t, 'set', 'controller', 'controller_enabled', bool(event['value']))
+            else:
+                raise ValueError(f"Unknown event type {kind!r}")
+        except KeyError as error:
+            raise ValueError(f"Event {event} is missing {error}") from None
+
+    events = np.array(compiled, dtype=EVENT_DTYPE)
+    return events[np.argsort(events['step'], kind='stable')]
+
+class Scenario:
+
+    """
+    Compiled scenario applied to a Simulation step by step.
+
+
+    Attributes:
+    -----------
+    name:
+        Name of the scenario, from its description or file
+    events:
+        Array of EVENT_DTYPE sorted by step
+    index:
+        Index of the next event to apply
+    steps:
+        Number of steps of the simulation so far
+    next_step:
+        Step of the next event, compared every step, or sys.maxsize once every event is applied
+
+
+    Methods:
+    --------
+    load(cls, path, dt):
+        Loads and compiles a scenario file for time step dt
+    update(self, simulation):
+        Applies the events due before the next step of a Simulation, called by Simulation.step
+    rewind(self):
+        Starts the scenario again from its first event
+    seek(self, index, steps):
+        Continues the scenario from event "index" after "steps" steps, e.g. restoring a checkpoint
+
+    """
+
+    def __init__(self, events, name=''):
+
+        self.name = name
+        self.events = events
+        self.rewind()
+
+    @classmethod
+    def load(cls, path, dt):
+        description = load_scenario_file(path)
+        return cls(compile_events(description.get('events', []), dt), description.get('name', path))
+
+    def rewind(self):
+        self.seek(0, 0)
+
+    def seek(self, index, steps):
+        self.index = index
+        self.steps = steps
+        self.next_step = int(self.events['step'][index]) if index < len(self.events) else sys.maxsize
+
+    def update(self, simulation):
+
+        if self.steps >= self.next_step:
+            events = self.events
+            while self.index < len(events) and events['step'][self.index] <= self.steps:
+                step, command, target, attribute, value = events[self.index].tolist()
+                name = COMMANDS[command]
+                if name == 'set':
+                    if ATTRIBUTES[attribute] == 'controller_enabled':
+                        value = bool(value)
+                    simulation.apply(name, TARGETS[target], ATTRIBUTES[attribute], value)
+                else:
+                    simulation.apply(name, value)
+                self.index += 1
+            self.next_step = int(events['step'][self.index]) if self.index < len(events) else sys.maxsize
+
+        self.steps += 1
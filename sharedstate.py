@@ -0,0 +1,439 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+from physics import Physics
+from controlpid import Control
+from simulation import Simulation, load_sample
+from recorder import Recorder
+from simthread import SimulationThread, SNAPSHOT_DTYPE, snapshot
+from metrics import Metrics
+from scenario import Scenario
+
+"""
+Shared memory bridge between the GUI and a simulator running in a separate process.
+
+The simulator and the GUI attach to one block of shared memory holding the latest snapshot of the state, the
+parameters of Physics and Control, and a ring of commands from the GUI. Neither process ever waits on the other
+or on a lock, so the simulator keeps its timing however busy the GUI is.
+
+The snapshot is written under a sequence lock: the sequence number is odd while the simulator writes, and a
+reader retries until it has copied the snapshot with the same even sequence number before and after, falling back
+on the last snapshot it read if a simulator dies mid write and the sequence never settles. The command
+ring has a single producer (the GUI) and a single consumer (the simulator), each only advancing its own index.
+Both rely on stores becoming visible in program order, as on x86.
+
+    python sharedstate.py NAME      runs a simulator attached to the block NAME, created by main.py --process
+"""
+
+# attributes of Physics, then Control, mirrored in the block, set by the GUI before the simulator starts
+PHYSICS_PARAMETERS = ('dt', 'g', 'length', 'angular_damping', 'cart_damping', 'angle_ref', 'cart_ref', 'init_angle')
+CONTROL_PARAMETERS = ('kp', 'kd', 'ki', 'kp_cart', 'kd_cart', 'ki_cart', 'controller_enabled')
+# Control.mode, mirrored after the parameters by index
+CONTROL_MODES = ('pid', 'lqr')
+
+# commands of Simulation.apply and targets of the 'set' command, sent by index
+COMMANDS = ('reset', 'add_velocity', 'set_angle', 'set')
+TARGETS = ('simulation', 'pendulum', 'controller')
+COMMAND_DTYPE = np.dtype([
+    ('command', np.uint8),
+    ('target', np.uint8),
+    ('attribute', 'S32'),
+    ('value', np.float64),
+    ('text', 'S8'),
+])
+
+def block_dtype(capacity):
+    """Returns the dtype of a shared state block with a command ring of "capacity" commands."""
+    return np.dtype([
+        ('capacity', np.uint64),
+        ('sequence', np.uint64),
+        ('snapshot', SNAPSHOT_DTYPE),
+        ('parameters', np.float64, len(PHYSICS_PARAMETERS) + len(CONTROL_PARAMETERS) + 1),
+        ('paused', np.uint8),
+        ('stop', np.uint8),
+        ('command_head', np.uint64),
+        ('command_tail', np.uint64),
+        ('commands', COMMAND_DTYPE, capacity),
+    ], align=True)
+
+def _attach(name):
+    # the creating process owns the block, so it mustn't be unlinked when an attached process exits
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    memory = shared_memory.SharedMemory(name)
+    resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory
+
+class SharedState:
+
+    """
+    Block of shared memory holding the state, parameters and commands of a simulation, viewed as a NumPy
+    structured array without copying.
+
+
+    Attributes:
+    -----------
+    memory:
+        SharedMemory instance holding the block
+    name:
+        Name of the shared memory, used by other processes to attach
+    capacity:
+        Number of commands the command ring holds
+    block:
+        Zero dimensional structured array (see block_dtype) viewing the shared memory
+    max_retries:
+        Number of times read retries a snapshot being written before returning the last snapshot read
+    last_snapshot:
+        Last consistent snapshot read, or None
+
+
+    Methods:
+    --------
+    create(cls, capacity=1024):
+        Creates a new block
+    attach(cls, name):
+        Attaches to an existing block by name
+    write(self, snapshot, parameters):
+        Writes a snapshot (a SNAPSHOT_DTYPE tuple) and parameters, used by the simulator only
+    read(self):
+        Returns a consistent copy of the latest snapshot, retrying while it is being written, or the last
+        snapshot read once max_retries is exceeded. Raises BufferError if no snapshot was ever read
+    send(self, name, *args):
+        Adds a command (see Simulation.apply) to the command ring, used by the GUI only. Raises BufferError if
+        the ring is full
+    receive(self):
+        Removes and returns all commands in the ring as a list of (name, args), used by the simulator only
+    close(self):
+        Detaches from the block
+    unlink(self):
+        Frees the block, called once by the process that created it
+
+    """
+
+    def __init__(self, memory, capacity):
+
+        self.memory = memory
+        self.name = memory.name
+        self.capacity = capacity
+        self.block = np.ndarray((), dtype=block_dtype(capacity), buffer=memory.buf)
+        self.max_retries = 10000
+        self.last_snapshot = None
+
+    @classmethod
+    def create(cls, capacity=1024):
+        memory = shared_memory.SharedMemory(create=True, size=block_dtype(capacity).itemsize)
+        state = cls(memory, capacity)
+        state.block[...] = np.zeros((), dtype=state.block.dtype)
+        state.block['capacity'] = capacity
+        return state
+
+    @classmethod
+    def attach(cls, name):
+        memory = _attach(name)
+        # capacity is the first field of every block, read before the rest of the layout is known
+        capacity = int(np.ndarray((), dtype=np.uint64, buffer=memory.buf))
+        return cls(memory, capacity)
+
+    def write(self, snapshot, parameters):
+        block = self.block
+        block['sequence'] += 1
+        block['snapshot'] = snapshot
+        block['parameters'] = parameters
+        block['sequence'] += 1
+
+    def read(self):
+        block = self.block
+        for i in range(self.max_retries):
+            sequence = int(block['sequence'])
+            if sequence % 2 == 0:
+                snapshot = block['snapshot'].copy()
+                if int(block['sequence']) == sequence:
+                    self.last_snapshot = snapshot
+                    return snapshot
+        # a write takes microseconds, so the simulator died mid write
+        if self.last_snapshot is None:
+            raise BufferError("Snapshot is never consistent, the simulator stopped while writing it")
+        return self.last_snapshot
+
+    def send(self, name, *args):
+        block = self.block
+        head = int(block['command_head'])
+        if head - int(block['command_tail']) >= self.capacity:
+            raise BufferError("Command ring is full, the simulator is not reading commands")
+
+        target, attribute, value, text = 0, b'', 0.0, b''
+        if name == 'set':
+            target, attribute, value = TARGETS.index(args[0]), args[1].encode(), args[2]
+            # string values, e.g. Control.mode, are sent as text
+            if isinstance(value, str):
+                value, text = 0.0, value.encode()
+        elif args:
+            value = args[0]
+        block['commands'][head % self.capacity] = (COMMANDS.index(name), target, attribute, value, text)
+        block['command_head'] = head + 1
+
+    def receive(self):
+        block = self.block
+        tail = int(block['command_tail'])
+        head = int(block['command_head'])
+        commands = []
+        for index in range(tail, head):
+            command, target, attribute, value, text = block['commands'][index % self.capacity].tolist()
+            name = COMMANDS[command]
+            if name == 'set':
+                commands.append((name, (TARGETS[target], attribute.decode(), text.decode() if text else value)))
+            elif name == 'reset':
+                commands.append((name, ()))
+            else:
+                commands.append((name, (value,)))
+        block['command_tail'] = head
+        return commands
+
+    def close(self):
+        # views of the buffer must be released before the shared memory can be closed
+        self.block = None
+        self.memory.close()
+
+    def unlink(self):
+        self.memory.unlink()
+
+def parameters(pendulum, controller):
+    """Returns the mirrored parameters of Physics and Control instances as a list in block order."""
+    return ([float(getattr(pendulum, name)) for name in PHYSICS_PARAMETERS] +
+            [float(getattr(controller, name)) for name in CONTROL_PARAMETERS] +
+            [float(CONTROL_MODES.index(controller.mode))])
+
+def load_parameters(values, pendulum, controller):
+    """Sets the mirrored parameters of Physics and Control instances from values in block order."""
+    values = list(values)
+    for name, value in zip(PHYSICS_PARAMETERS, values):
+        setattr(pendulum, name, value)
+    for name, value in zip(CONTROL_PARAMETERS, values[len(PHYSICS_PARAMETERS):]):
+        setattr(controller, name, value)
+    controller.controller_enabled = bool(controller.controller_enabled)
+    controller.mode = CONTROL_MODES[int(values[-1])]
+
+class SharedSimulation(SimulationThread):
+
+    """
+    Real time simulation loop of SimulationThread run in the simulator process, taking commands from and
+    publishing snapshots to a SharedState block instead of a queue and a double buffer.
+
+
+    Attributes:
+    -----------
+    state:
+        Instance of SharedState class the simulation is attached to
+    parent:
+        Process id of the GUI that started the simulator, which stops when that process exits, or None
+    paused:
+        Boolean read from and written to the block, set by the GUI
+
+
+    Methods:
+    --------
+    run(self):
+        Runs the simulation loop until the GUI sets the stop flag of the block, or the parent process exits
+
+    """
+
+    def __init__(self, simulation, state, parent=None, max_steps=10):
+
+        self.state = state
+        self.parent = parent
+        super().__init__(simulation, max_steps)
+
+    @property
+    def paused(self):
+        return bool(self.state.block['paused'])
+
+    @paused.setter
+    def paused(self, value):
+        self.state.block['paused'] = value
+
+    def apply_commands(self):
+        commands = self.state.receive()
+        for name, args in commands:
+            self.simulation.apply(name, *args)
+        self.commands_applied += len(commands)
+        return bool(commands)
+
+    def publish(self, wall_time):
+        simulation = self.simulation
+        self.state.write(snapshot(simulation, self.steps, wall_time, self.commands_applied),
+                parameters(simulation.pendulum, simulation.controller))
+
+    def run(self):
+
+        self.next_step = self.clock()
+        while not self.state.block['stop']:
+            # a GUI that exits without stopping the simulator, e.g. killed, leaves it with a new parent
+            if self.parent is not None and os.getppid() != self.parent:
+                break
+            time.sleep(self.update())
+
+class SimulatorProcess:
+
+    """
+    Simulator in a separate process, started and followed by the GUI through a SharedState block. Has the
+    same interface as SimulationThread, so the GUI can follow either.
+
+
+    Attributes:
+    -----------
+    state:
+        Instance of SharedState class created for the simulator
+    record:
+        Path of a recording file written by the simulator, or None
+    scenario:
+        Path of a scenario file applied by the simulator, or None
+    telemetry:
+        (host, port, decimation) of a telemetry server run by the simulator, or None
+    process:
+        Simulator process, None until started
+    clock:
+        Function returning the wall clock time in seconds, shared with the simulator process
+    paused:
+        Boolean written to the block to pause the simulator
+    commands_sent:
+        Number of commands added to the command ring, compared with the number applied in snapshots
+    dropped_commands:
+        Number of commands dropped as the command ring was full
+
+
+    Methods:
+    --------
+    start(self):
+        Starts the simulator process
+    stop(self):
+        Stops the simulator process and frees the block
+    send(self, name, *args):
+        Sends a command to the simulator, dropping it if the command ring is full, e.g. as the simulator has
+        stopped, and returning whether it was sent
+    read(self):
+        Returns a consistent copy of the latest snapshot
+
+    """
+
+    def __init__(self, pendulum, controller, record=None, scenario=None, telemetry=None, capacity=1024):
+
+        self.state = SharedState.create(capacity)
+        self.record = record
+        self.scenario = scenario
+        self.telemetry = telemetry
+        self.process = None
+        self.clock = time.perf_counter
+        self.commands_sent = 0
+        self.dropped_commands = 0
+
+        # simulator starts from the current state and parameters of the GUI
+        self.state.write(snapshot(Simulation(pendulum, controller), 0, self.clock()),
+                parameters(pendulum, controller))
+
+    @property
+    def paused(self):
+        return bool(self.state.block['paused'])
+
+    @paused.setter
+    def paused(self, value):
+        self.state.block['paused'] = value
+
+    def start(self):
+        command = [sys.executable, os.path.abspath(__file__), self.state.name, "--parent", str(os.getpid())]
+        if self.record:
+            command += ["--record", self.record]
+        if self.scenario:
+            command += ["--scenario", self.scenario]
+        if self.telemetry is not None:
+            host, port, decimation = self.telemetry
+            command += ["--telemetry-host", host, "--telemetry-port", str(port),
+                        "--telemetry-decimation", str(decimation)]
+        self.process = subprocess.Popen(command)
+
+    def stop(self):
+        self.state.block['stop'] = 1
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        self.state.close()
+        self.state.unlink()
+
+    def send(self, name, *args):
+        # commands come from Qt slots of the GUI, which must not raise
+        try:
+            self.state.send(name, *args)
+        except BufferError:
+            self.dropped_commands += 1
+            # reported once, a stopped simulator otherwise reporting every slider movement
+            if self.dropped_commands == 1:
+                exited = self.process is not None and self.process.poll() is not None
+                print(f"command {name!r} dropped, " + ("the simulator process has exited" if exited else
+                      "the simulator is not reading commands") + ", further drops are only counted",
+                      file=sys.stderr)
+            return False
+        self.commands_sent += 1
+        return True
+
+    def read(self):
+        return self.state.read()
+
+def run_simulator(name, record=None, parent=None, scenario=None, telemetry=None):
+    """
+    Runs a simulator attached to the block "name" until the stop flag of the block is set, or the process
+    with id "parent" (if given) is no longer its parent, applying the scenario file "scenario" if given and
+    streaming the state from a telemetry server at "telemetry" (host, port, decimation) if given.
+    """
+    state = SharedState.attach(name)
+    controller = Control()
+    pendulum = Physics(controller.u)
+    load_parameters(state.block['parameters'], pendulum, controller)
+    simulation = Simulation(pendulum, controller)
+    simulation.t = load_sample(state.read(), pendulum, controller)
+    simulation.metrics = Metrics(simulation)
+    if scenario:
+        simulation.scenario = Scenario.load(scenario, pendulum.dt)
+
+    if record:
+        simulation.recorder = Recorder(record, pendulum.dt)
+    if telemetry is not None:
+        # imported here, so simulators without telemetry don't load asyncio
+        from telemetryserver import TelemetryServer
+        simulation.publisher = TelemetryServer(*telemetry)
+        simulation.publisher.start()
+    try:
+        SharedSimulation(simulation, state, parent).run()
+    finally:
+        if simulation.recorder is not None:
+            simulation.recorder.close()
+        if simulation.publisher is not None:
+            simulation.publisher.stop()
+        state.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulator process attached to a shared state block")
+    parser.add_argument("name", help="name of the shared memory block, created by main.py --process")
+    parser.add_argument("--record", help="stream every simulated step to this recording file")
+    parser.add_argument("--parent", type=int, help="process id of the GUI, stopping the simulator when it exits")
+    parser.add_argument("--scenario", help="apply the timed events of this scenario file")
+    parser.add_argument("--telemetry-port", type=int, help="stream the state to TCP clients on this port")
+    parser.add_argument("--telemetry-host", default="127.0.0.1", help="address the telemetry server listens on")
+    parser.add_argument("--telemetry-decimation", type=int, default=1, help="stream every N-th step")
+    args = parser.parse_args(argv)
+    if args.telemetry_decimation < 1:
+        parser.error("--telemetry-decimation must be at least 1")
+    telemetry = None
+    if args.telemetry_port is not None:
+        telemetry = (args.telemetry_host, args.telemetry_port, args.telemetry_decimation)
+    run_simulator(args.name, args.record, args.parent, args.scenario, telemetry)
+
+if __name__ == "__main__":
+    main()
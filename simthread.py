@@ -0,0 +1,168 @@
+import queue
+import threading
+import time
+import numpy as np
+
+from simulation import TRAJECTORY_DTYPE
+from metrics import METRICS
+
+"""
+Real time simulation in a worker thread, separate from the Qt GUI thread.
+
+The worker steps its own Physics and Control instances at a fixed dt paced to the wall clock, so slider drags,
+window resizes and slow frames on the GUI thread don't stall the plant. State reaches the GUI as snapshots in a
+double buffer and commands from the GUI arrive through a queue, so neither side ever waits on a lock.
+"""
+
+# state of the simulation after a step, with the number of steps so far, the wall clock time of the step, the
+# metrics of the run in METRICS order (NaN without metrics) and the number of commands applied so far
+SNAPSHOT_DTYPE = np.dtype(TRAJECTORY_DTYPE.descr + [('steps', np.int64), ('wall_time', np.float64),
+                                                    ('metrics', np.float64, (len(METRICS),)),
+                                                    ('commands', np.int64)])
+
+def snapshot(simulation, steps, wall_time, commands=0):
+    """Returns the state of a simulation as a tuple in SNAPSHOT_DTYPE order."""
+    metrics = simulation.metrics.values() if simulation.metrics is not None else (np.nan,) * len(METRICS)
+    return simulation.sample() + (steps, wall_time, metrics, commands)
+
+class SimulationThread:
+
+    """
+    Runs a Simulation in real time in a daemon thread.
+
+
+    Attributes:
+    -----------
+    simulation:
+        Instance of Simulation class stepped by the thread only
+    commands:
+        Queue of (name, args) commands from the GUI, applied with Simulation.apply before the next step
+    snapshots:
+        Two records (SNAPSHOT_DTYPE), the latest published snapshot and the one being written
+    front:
+        Index of the latest published snapshot in snapshots
+    steps:
+        Number of steps computed
+    commands_sent:
+        Number of commands sent, counted by the GUI
+    commands_applied:
+        Number of commands applied, counted by the thread and published in snapshots, so the GUI can tell
+        whether a snapshot shows the effect of a command it sent
+    paused:
+        Boolean set by the GUI to pause the simulation
+    max_steps:
+        Maximum number of steps computed to catch up after a stall, beyond which simulated time falls behind
+    next_step:
+        Wall clock time the next step is due
+    clock:
+        Function returning the wall clock time in seconds
+
+
+    Methods:
+    --------
+    start(self):
+        Starts the thread
+    stop(self):
+        Stops the thread, waiting for the step in progress to finish
+    send(self, name, *args):
+        Queues a command for the simulation, callable from any thread
+    read(self):
+        Returns a copy of the latest snapshot, callable from any thread
+    publish(self, wall_time):
+        Writes the current state, stepped at wall clock time wall_time, to the back snapshot and makes it the latest
+    apply_commands(self):
+        Applies all queued commands, returning True if there were any
+    run(self):
+        Loop of the thread, calling update until stopped
+    update(self):
+        Applies commands, computes the fixed dt steps the wall clock has reached and publishes the new state,
+        returning the time in seconds to sleep until the next step is due
+
+    """
+
+    def __init__(self, simulation, max_steps=10):
+
+        self.simulation = simulation
+        self.commands = queue.SimpleQueue()
+        self.snapshots = np.zeros(2, dtype=SNAPSHOT_DTYPE)
+        self.front = 0
+        self.steps = 0
+        self.commands_sent = 0
+        self.commands_applied = 0
+        self.paused = False
+        self.max_steps = max_steps
+        self.clock = time.perf_counter
+        self.next_step = self.clock()
+
+        self.running = False
+        self.thread = None
+        self.publish(self.clock())
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="simulation", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def send(self, name, *args):
+        self.commands_sent += 1
+        self.commands.put((name, args))
+
+    def read(self):
+        # a record is written and copied whole while holding the GIL, so a copy is never partly written
+        return self.snapshots[self.front].copy()
+
+    def publish(self, wall_time):
+        back = 1 - self.front
+        self.snapshots[back] = snapshot(self.simulation, self.steps, wall_time, self.commands_applied)
+        self.front = back
+
+    def apply_commands(self):
+        applied = False
+        while True:
+            try:
+                name, args = self.commands.get_nowait()
+            except queue.Empty:
+                return applied
+            self.simulation.apply(name, *args)
+            self.commands_applied += 1
+            applied = True
+
+    def run(self):
+
+        self.next_step = self.clock()
+        while self.running:
+            time.sleep(self.update())
+
+    def update(self):
+
+        simulation = self.simulation
+        dt = simulation.pendulum.dt
+        applied = self.apply_commands()
+
+        now = self.clock()
+        steps = 0
+        if self.paused:
+            self.next_step = now + dt
+        else:
+            # steps due by now, skipping ahead if too far behind
+            while self.next_step <= now and steps < self.max_steps:
+                simulation.step()
+                self.steps += 1
+                steps += 1
+                self.next_step += dt
+            if self.next_step <= now:
+                self.next_step = now + dt
+
+        # commands are published straight away, so e.g. a reset while paused is shown
+        if steps:
+            self.publish(self.next_step - dt)
+        elif applied:
+            self.publish(now)
+
+        return max(0, min(self.next_step - self.clock(), dt))
@@ -0,0 +1,255 @@
+import numpy as np
+from integrators import SemiImplicitEuler
+import kernel
+import lqr
+
+# fields recorded for every step of a trajectory
+TRAJECTORY_DTYPE = np.dtype([
+    ('t', np.float64),
+    ('angle', np.float64),
+    ('angular_velocity', np.float64),
+    ('x', np.float64),
+    ('xdot', np.float64),
+    ('u', np.float64),
+    ('u_angle', np.float64),
+    ('u_cart', np.float64),
+    ('angle_error_integral', np.float64),
+    ('cart_velocity_error_integral', np.float64),
+])
+
+class Simulation:
+
+    """
+    Headless simulation of pendulum on cart, stepping physics and control without any animation.
+
+
+    Attributes:
+    -----------
+    pendulum:
+        Instance of Physics class
+    controller:
+        Instance of Control class
+    t:
+        Simulated time, incremented by dt every step
+    manual_input:
+        Control input added on top of the controller output every step, used for manual acceleration of the cart
+    recorder:
+        Instance of Recorder class every step is streamed to, or None
+    profiler:
+        Instance of FrameProfiler class timing Physics.compute and Control.compute when enabled, or None
+    metrics:
+        Instance of Metrics class updated after every step, or None
+    scenario:
+        Instance of Scenario class whose events are applied before every step, or None
+    publisher:
+        Instance of TelemetryServer class every step is published to, or None
+
+
+    Methods:
+    --------
+    step(self):
+        Computes one step of Physics and Control in the same order as the real time animation
+    compute_control(self):
+        Computes Control from the errors and state of Physics
+    sample(self):
+        Returns the current state as a tuple in TRAJECTORY_DTYPE order
+    reset(self):
+        Returns the pendulum to its initial angle, with cart position, velocities, error integrals and control
+        inputs set to zero, and starts the metrics and scenario again
+    apply(self, name, *args):
+        Applies a command from the GUI, given as a name and arguments so commands can be queued and sent to a
+        simulation running in another thread or process. Commands are 'reset', 'add_velocity' (angular
+        velocity), 'set_angle' (angle in degrees) and 'set' (target, attribute, value), target being
+        'simulation', 'pendulum' or 'controller'. Setting a parameter of the plant updates the LQR gains
+    run(self, steps=None, duration=None, fast=False):
+        Steps the simulation as fast as possible for a number of steps or a duration in seconds, returning
+        the trajectory as a structured NumPy array with one record (TRAJECTORY_DTYPE) per step. With fast set,
+        the steps run in the fused kernel of kernel.py (compiled with Numba when installed), which supports
+        the default integrator and PID controller without a recorder, metrics, scenario, publisher or manual input
+
+    """
+
+    def __init__(self, pendulum, controller):
+
+        self.pendulum = pendulum
+        self.controller = controller
+        self.controller.set_plant(pendulum)
+
+        self.t = 0
+        self.manual_input = 0
+        self.recorder = None
+        self.profiler = None
+        self.metrics = None
+        self.scenario = None
+        self.publisher = None
+
+    def step(self):
+
+        if self.scenario is not None:
+            self.scenario.update(self)
+
+        if self.profiler is None or not self.profiler.enabled:
+            self.pendulum.compute(self.controller.u)
+            self.compute_control()
+        else:
+            start = self.profiler.clock()
+            self.pendulum.compute(self.controller.u)
+            middle = self.profiler.clock()
+            self.compute_control()
+            self.profiler.record('physics', middle - start)
+            self.profiler.record('control', self.profiler.clock() - middle)
+
+        # manual acceleration of cart added after controller
+        self.controller.u += self.manual_input
+        self.t += self.pendulum.dt
+
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.metrics is not None:
+            self.metrics.update(self)
+        if self.publisher is not None:
+            self.publisher.publish(self)
+
+    def compute_control(self):
+        self.controller.compute(self.pendulum.angle_error, self.pendulum.angular_velocity,
+                self.pendulum.angle_error_integral, self.pendulum.cart_velocity_error,
+                self.pendulum.cart_velocity_error_integral)
+
+    def sample(self):
+        pend = self.pendulum
+        ctrl = self.controller
+        return (self.t, pend.angle, pend.angular_velocity, pend.x, pend.xdot, ctrl.u,
+                ctrl.u_angle, ctrl.u_cart, pend.angle_error_integral, pend.cart_velocity_error_integral)
+
+    def reset(self):
+        pend = self.pendulum
+        ctrl = self.controller
+        pend.x = 0
+        pend.xdot = 0
+        pend.angle = pend.init_angle
+        pend.angular_velocity = 0
+        pend.angle_error_integral = 0
+        pend.cart_velocity_error_integral = 0
+        ctrl.u_angle = 0
+        ctrl.u_cart = 0
+        ctrl.u = 0
+        if self.metrics is not None:
+            self.metrics.reset(self)
+        if self.scenario is not None:
+            self.scenario.rewind()
+
+    def apply(self, name, *args):
+        if name == 'reset':
+            self.reset()
+        elif name == 'add_velocity':
+            self.pendulum.add_velocity(*args)
+        elif name == 'set_angle':
+            self.pendulum.set_angle(*args)
+        elif name == 'set':
+            target, attribute, value = args
+            targets = {'simulation': self, 'pendulum': self.pendulum, 'controller': self.controller}
+            setattr(targets[target], attribute, value)
+            # lqr gains are recomputed (or taken from the cache) only for a change of the linearised plant
+            if target == 'pendulum' and attribute in lqr.PLANT_PARAMETERS:
+                self.controller.set_plant(self.pendulum)
+        else:
+            raise ValueError(f"Unknown command {name!r}")
+
+    def run(self, steps=None, duration=None, fast=False):
+
+        if steps is None:
+            if duration is None:
+                raise ValueError("Either steps or duration must be given")
+            steps = int(round(duration / self.pendulum.dt))
+
+        if fast:
+            return self._run_kernel(steps)
+
+        trajectory = np.empty(steps, dtype=TRAJECTORY_DTYPE)
+        for i in range(steps):
+            self.step()
+            trajectory[i] = self.sample()
+
+        return trajectory
+
+    def _run_kernel(self, steps):
+
+        if (type(self.pendulum.integrator) is not SemiImplicitEuler or self.recorder is not None
+                or self.metrics is not None or self.scenario is not None or self.publisher is not None
+                or self.manual_input or self.controller.mode != 'pid'):
+            raise ValueError("Fast runs need the default integrator, the PID controller, no recorder, no metrics, "
+                             "no scenario, no publisher and no manual input")
+
+        state, params = kernel.pack(self.pendulum, self.controller)
+        trajectory = np.empty(steps, dtype=TRAJECTORY_DTYPE)
+        # kernel writes straight into the trajectory, viewed as (steps, 1 system, fields after 't')
+        states = trajectory.view(np.float64).reshape(steps, 1, len(TRAJECTORY_DTYPE.names))[:, :, 1:]
+        kernel.simulate(state, params, steps, states)
+        kernel.unpack(state, self.pendulum, self.controller)
+
+        # time accumulated by repeated addition, as in step
+        times = np.full(steps + 1, self.pendulum.dt)
+        times[0] = self.t
+        trajectory['t'] = np.cumsum(times)[1:]
+        self.t = float(trajectory['t'][-1]) if steps else self.t
+        return trajectory
+
+def load_sample(record, pendulum, controller):
+    """
+    Copies the state of a record with the fields of TRAJECTORY_DTYPE into Physics and Control instances,
+    returning its time.
+    """
+    pendulum.angle = float(record['angle'])
+    pendulum.angular_velocity = float(record['angular_velocity'])
+    pendulum.x = float(record['x'])
+    pendulum.xdot = float(record['xdot'])
+    pendulum.angle_error_integral = float(record['angle_error_integral'])
+    pendulum.cart_velocity_error_integral = float(record['cart_velocity_error_integral'])
+    controller.u = float(record['u'])
+    controller.u_angle = float(record['u_angle'])
+    controller.u_cart = float(record['u_cart'])
+    return float(record['t'])
+
+class BatchSimulation:
+
+    """
+    Headless simulation of many pendulums on carts, stepping BatchPhysics and BatchControl together.
+
+
+    Attributes:
+    -----------
+    pendulums:
+        Instance of BatchPhysics class
+    controllers:
+        Instance of BatchControl class of the same size
+    t:
+        Simulated time, incremented by dt every step
+    metrics:
+        Instance of BatchMetrics class updated after every step, or None
+
+
+    Methods:
+    --------
+    step(self):
+        Computes one step of all pendulums and controllers in the same order as Simulation.step
+
+    """
+
+    def __init__(self, pendulums, controllers):
+
+        self.pendulums = pendulums
+        self.controllers = controllers
+
+        self.t = 0
+        self.metrics = None
+
+    def step(self):
+
+        self.pendulums.compute(self.controllers.u)
+        self.controllers.compute(self.pendulums.angle_error, self.pendulums.angular_velocity,
+                self.pendulums.angle_error_integral, self.pendulums.cart_velocity_error,
+                self.pendulums.cart_velocity_error_integral)
+
+        self.t += self.pendulums.dt
+        if self.metrics is not None:
+            self.metrics.update(self)
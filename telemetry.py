@@ -0,0 +1,69 @@
+import numpy as np
+
+# fields of each telemetry sample, angles in degrees as plotted on the graph
+TELEMETRY_DTYPE = np.dtype([
+    ('t', np.float64),
+    ('angle', np.float64),
+    ('angular_velocity', np.float64),
+    ('x', np.float64),
+    ('xdot', np.float64),
+    ('u', np.float64),
+])
+
+class Telemetry:
+
+    """
+    Fixed capacity ring buffer of telemetry samples held in a preallocated structured NumPy array.
+    Every sample is written twice, at index i and i + capacity, so the latest samples are always one
+    contiguous slice of the buffer and can be viewed in time order without copying or unwrapping.
+
+
+    Attributes:
+    -----------
+    capacity:
+        Maximum number of samples kept, older samples are overwritten
+    buffer:
+        Structured array (TELEMETRY_DTYPE) of length 2 * capacity holding the samples
+    head:
+        Index in [0, capacity) where the next sample will be written
+    size:
+        Number of samples currently held
+
+
+    Methods:
+    --------
+    append(self, t, angle, angular_velocity, x, xdot, u):
+        Adds a sample in O(1), overwriting the oldest sample once full
+    view(self):
+        Returns the held samples, oldest first, as a view of the buffer. Fields are accessed by name,
+        e.g. view()['angle']. The view is only valid until the next append
+    clear(self):
+        Removes all samples
+
+    """
+
+    def __init__(self, capacity):
+
+        self.capacity = capacity
+        self.buffer = np.zeros(2 * capacity, dtype=TELEMETRY_DTYPE)
+        self.head = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, t, angle, angular_velocity, x, xdot, u):
+        sample = (t, angle, angular_velocity, x, xdot, u)
+        self.buffer[self.head] = sample
+        self.buffer[self.head + self.capacity] = sample
+        self.head = (self.head + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def view(self):
+        end = self.head + self.capacity
+        return self.buffer[end - self.size:end]
+
+    def clear(self):
+        self.head = 0
+        self.size = 0
@@ -0,0 +1,293 @@
+import argparse
+import asyncio
+import collections
+import socket
+import struct
+import threading
+import time
+import numpy as np
+
+"""
+Streaming of the simulated state to remote dashboards over TCP.
+
+TelemetryServer runs an asyncio server in a background thread. The simulation hands it every step, of which
+every "decimation"th sample is added to a batch, and full batches (or batches held for longer than
+"max_latency") are sent as one frame to every client. Each client has its own bounded queue of frames, written
+by its own task: a slow client only falls behind itself, its oldest frames being dropped once the queue is full,
+and the simulation loop never waits on the network.
+
+A frame is a 16 byte header (magic, number of samples, sequence number of the frame) followed by the samples,
+little endian, in SAMPLE_DTYPE. Gaps in the sequence numbers a client receives are frames dropped for it.
+
+    python telemetryserver.py HOST:PORT    prints the frames streamed by a server, e.g. main.py --telemetry-port
+"""
+
+MAGIC = b'PTLM'
+FRAME_HEADER = struct.Struct('<4sIQ') # magic, sample count, frame sequence number
+
+# state of one step, time in double and the rest in single precision to keep frames compact
+SAMPLE_DTYPE = np.dtype([
+    ('t', '<f8'),
+    ('angle', '<f4'),
+    ('angular_velocity', '<f4'),
+    ('x', '<f4'),
+    ('xdot', '<f4'),
+    ('u', '<f4'),
+])
+
+class TelemetryServer:
+
+    """
+    Publisher of the state of a simulation to TCP clients, with per client backpressure.
+
+
+    Attributes:
+    -----------
+    host, port:
+        Address the server listens on, port 0 choosing a free port, which start replaces with the actual port
+    decimation:
+        Publishing every decimation-th step only
+    batch:
+        Preallocated samples (SAMPLE_DTYPE) of the frame being filled, sent once full
+    count:
+        Number of samples in batch
+    max_latency:
+        Longest wall clock time in seconds a sample waits in a part filled batch
+    queue_frames:
+        Number of frames queued per client, beyond which its oldest frames are dropped
+    sequence:
+        Sequence number of the next frame
+    clients:
+        Dictionary of connected client writers to their [queue, event, dropped count, task] state
+    loop:
+        Event loop of the server thread, None when stopped
+
+
+    Methods:
+    --------
+    start(self):
+        Starts the server thread, returning once the server is listening
+    stop(self):
+        Sends the last samples, closes every connection and stops the server thread
+    publish(self, simulation):
+        Adds the current state of a Simulation, called after every step from the simulation loop
+    flush(self):
+        Sends the samples of a part filled batch
+    dropped(self):
+        Returns the total number of frames dropped for slow clients
+
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, decimation=1, batch_size=32, max_latency=0.1, queue_frames=64):
+
+        if decimation < 1 or batch_size < 1 or queue_frames < 1:
+            raise ValueError("Telemetry decimation, batch size and queued frames must be at least 1")
+        self.host = host
+        self.port = port
+        self.decimation = int(decimation)
+        self.batch = np.zeros(batch_size, dtype=SAMPLE_DTYPE)
+        self.count = 0
+        self.max_latency = max_latency
+        self.queue_frames = queue_frames
+        self.sequence = 0
+        self.clients = {}
+        self.loop = None
+        self.clock = time.perf_counter
+
+        self.steps = 0
+        self.batch_start = 0
+        self.thread = None
+        self.server = None
+        self.dropped_frames = 0
+
+    def start(self):
+        started = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(started,), name="telemetry", daemon=True)
+        self.thread.start()
+        started.wait()
+        if self.server is None:
+            raise OSError(f"Telemetry server could not listen on {self.host}:{self.port}")
+
+    def stop(self):
+        self.flush()
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop)
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def publish(self, simulation):
+
+        self.steps += 1
+        if self.steps % self.decimation or not self.clients:
+            return
+
+        pend = simulation.pendulum
+        if self.count == 0:
+            self.batch_start = self.clock()
+        self.batch[self.count] = (simulation.t, pend.angle, pend.angular_velocity, pend.x, pend.xdot,
+                simulation.controller.u)
+        self.count += 1
+        if self.count == len(self.batch) or self.clock() - self.batch_start >= self.max_latency:
+            self.flush()
+
+    def flush(self):
+        if self.count == 0:
+            return
+        frame = FRAME_HEADER.pack(MAGIC, self.count, self.sequence) + self.batch[:self.count].tobytes()
+        self.sequence += 1
+        self.count = 0
+        loop = self.loop
+        if loop is not None:
+            try:
+                # hands the frame to the server thread without waiting for it
+                loop.call_soon_threadsafe(self._broadcast, frame)
+            except RuntimeError:
+                pass # loop closed while stopping
+
+    def dropped(self):
+        return self.dropped_frames + sum(client[2] for client in list(self.clients.values()))
+
+    def _run(self, started):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            try:
+                self.server = loop.run_until_complete(asyncio.start_server(self._serve, self.host, self.port))
+            except OSError:
+                return
+            self.port = self.server.sockets[0].getsockname()[1]
+            self.loop = loop
+            started.set()
+            loop.run_forever()
+        finally:
+            self.loop = None
+            started.set()
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+    async def _shutdown(self, timeout=1.0):
+        self.server.close()
+        # clients are sent the frames queued for them, then closed, waiting at most "timeout" for slow ones
+        tasks = [client[3] for client in self.clients.values()]
+        self._broadcast(None)
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        for writer in list(self.clients):
+            writer.transport.abort()
+        if tasks:
+            await asyncio.wait(tasks) # aborted clients leave their drain and finish
+        self.loop.stop()
+
+    def _broadcast(self, frame):
+        for client in self.clients.values():
+            frames, ready = client[:2]
+            if len(frames) == frames.maxlen:
+                client[2] += 1 # oldest frame dropped by the deque
+            frames.append(frame)
+            ready.set()
+
+    async def _serve(self, reader, writer):
+
+        writer.transport.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # queue, event set when frames are queued, number of frames dropped and task of the client
+        client = [collections.deque(maxlen=self.queue_frames), asyncio.Event(), 0, asyncio.current_task()]
+        self.clients[writer] = client
+        frames, ready = client[:2]
+        try:
+            # a client closing its end is only seen as the transport closing, drain not raising for it
+            while not writer.is_closing():
+                await ready.wait()
+                ready.clear()
+                while frames and not writer.is_closing():
+                    frame = frames.popleft()
+                    if frame is None:
+                        await writer.drain()
+                        return
+                    writer.write(frame)
+                # waits while the client's socket buffer is full, frames meanwhile queueing (and dropping) above
+                await writer.drain()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.dropped_frames += self.clients.pop(writer)[2]
+            writer.close()
+
+class TelemetryClient:
+
+    """
+    Blocking client of a TelemetryServer, e.g. for a dashboard or a loopback test.
+
+
+    Attributes:
+    -----------
+    socket:
+        Connected TCP socket
+
+
+    Methods:
+    --------
+    receive(self):
+        Returns the next frame as (sequence number, samples), samples being an array of SAMPLE_DTYPE, or None
+        once the server has closed the connection
+    close(self):
+        Closes the connection
+
+    """
+
+    def __init__(self, host, port, timeout=None):
+
+        self.socket = socket.create_connection((host, port), timeout=timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.socket.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return bytes(data)
+
+    def receive(self):
+        header = self._read(FRAME_HEADER.size)
+        if header is None:
+            return None
+        magic, count, sequence = FRAME_HEADER.unpack(header)
+        if magic != MAGIC:
+            raise ValueError("Stream is not pendulum telemetry")
+        samples = self._read(count * SAMPLE_DTYPE.itemsize)
+        if samples is None:
+            return None
+        return sequence, np.frombuffer(samples, dtype=SAMPLE_DTYPE)
+
+    def close(self):
+        self.socket.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the telemetry streamed by a pendulum telemetry server")
+    parser.add_argument("address", help="HOST:PORT of the server")
+    args = parser.parse_args(argv)
+    host, _, port = args.address.rpartition(':')
+
+    expected = None
+    with TelemetryClient(host or '127.0.0.1', int(port)) as client:
+        while (frame := client.receive()) is not None:
+            sequence, samples = frame
+            if expected is not None and sequence != expected:
+                print(f"{sequence - expected} frames dropped")
+            expected = sequence + 1
+            for sample in samples:
+                print(f"t {sample['t']:8.2f}  angle {np.rad2deg(sample['angle']):8.2f} deg  x {sample['x']:8.2f}  "
+                      f"u {sample['u']:8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import itertools
+import tracemalloc
+
+import pytest
+
+from physics import Physics
+from controlpid import Control
+from simulation import Simulation
+
+def allocated_per_step(simulation, steps=5000):
+    # bytes allocated while a step is in progress, traced one step at a time so temporaries freed within the
+    # step are counted too
+    for i in range(1000):
+        simulation.step()
+    tracemalloc.start()
+    try:
+        allocated = 0
+        for i in itertools.repeat(None, steps):
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            simulation.step()
+            allocated += tracemalloc.get_traced_memory()[1] - start
+    finally:
+        tracemalloc.stop()
+    return allocated / steps
+
+@pytest.mark.parametrize('enabled', [True, False])
+def test_simulation_step_allocates_nothing(enabled):
+    controller = Control()
+    controller.controller_enabled = enabled
+    pendulum = Physics(controller.u)
+    pendulum.angle = pendulum.init_angle = -0.3
+    assert allocated_per_step(Simulation(pendulum, controller)) == 0
@@ -0,0 +1,35 @@
+import matplotlib
+matplotlib.use('Agg')
+
+from physics import Physics
+from controlpid import Control
+from simulation import Simulation
+from simthread import SimulationThread
+from visual import Visual
+from animations import Animations
+
+def test_jump_is_not_interpolated_until_a_snapshot_applies_it():
+    controller = Control()
+    pendulum = Physics(controller.u)
+    animate = Animations(pendulum, controller, Visual(pendulum))
+    # thread driven by hand rather than started, to order its steps and commands
+    thread = SimulationThread(Simulation(Physics(controller.u), Control()))
+    animate.sim_thread = thread
+
+    thread.send('set_angle', 90)
+    animate.jumped()
+    # a snapshot with new steps published before the thread takes the command
+    thread.simulation.step()
+    thread.steps += 1
+    thread.publish(thread.clock())
+    animate.follow_thread()
+    assert animate.jump_commands == 1
+
+    thread.apply_commands()
+    thread.simulation.step()
+    thread.steps += 1
+    thread.publish(thread.clock())
+    animate.follow_thread()
+    assert animate.jump_commands is None
+    assert animate.previous_angle == pendulum.angle
+    assert animate.previous_x == pendulum.x
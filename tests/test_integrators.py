@@ -0,0 +1,33 @@
+import math
+
+import pytest
+
+from physics import Physics
+from integrators import make_integrator
+
+def test_rk45_finishes_steps_of_diverged_state():
+    pendulum = Physics(0)
+    pendulum.integrator = make_integrator('rk45')
+    pendulum.angle = math.nan
+    for i in range(10):
+        pendulum.compute(0)
+    assert math.isnan(pendulum.angle)
+
+def test_rk45_step_size_stays_above_minimum():
+    pendulum = Physics(0)
+    pendulum.integrator = make_integrator('rk45', rtol=1e-14, atol=1e-14)
+    pendulum.angle = -0.3
+    pendulum.compute(0)
+    assert pendulum.integrator.h >= pendulum.integrator.min_step * pendulum.dt
+    assert pendulum.integrator.evaluations <= 7 / pendulum.integrator.min_step + 1
+
+@pytest.mark.filterwarnings('ignore::RuntimeWarning') # NumPy warns about the NaN, as it always has
+@pytest.mark.parametrize('name', ['semi_implicit_euler', 'euler', 'rk4', 'rk45'])
+def test_infinite_angle_gives_nan_rather_than_raising(name):
+    pendulum = Physics(0)
+    pendulum.integrator = make_integrator(name)
+    pendulum.angle = math.inf
+    for i in range(10):
+        pendulum.compute(0)
+    assert math.isnan(pendulum.angle)
+    assert all(math.isnan(value) for value in pendulum.pendulum_pos(math.inf))
@@ -0,0 +1,26 @@
+import math
+
+from physics import Physics
+from controlpid import Control
+from simulation import Simulation
+from metrics import Metrics
+
+def test_diverged_angle_counts_as_fallen():
+    controller = Control()
+    simulation = Simulation(Physics(controller.u), controller)
+    simulation.metrics = Metrics(simulation)
+    for i in range(5):
+        simulation.step()
+    peak = simulation.metrics.peak_angle_error
+
+    for angle in (math.inf, -math.inf, math.nan):
+        simulation.pendulum.angle = angle
+        simulation.metrics.update(simulation)
+    results = simulation.metrics.results()
+    assert results['time_to_fall'] == simulation.t
+    assert results['settling_time'] == math.inf
+    assert simulation.metrics.peak_angle_error == peak
+
+    simulation.pendulum.angle = math.inf
+    simulation.metrics.reset(simulation)
+    assert not simulation.metrics.settled
@@ -0,0 +1,116 @@
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from physics import Physics
+from controlpid import Control
+from simulation import Simulation
+from telemetryserver import TelemetryServer, TelemetryClient, FRAME_HEADER, SAMPLE_DTYPE
+
+def make_simulation():
+    controller = Control()
+    controller.controller_enabled = True
+    pendulum = Physics(controller.u)
+    pendulum.angle = pendulum.init_angle = -0.3
+    return Simulation(pendulum, controller)
+
+def wait_for_clients(server, count, timeout=5):
+    deadline = time.monotonic() + timeout
+    while len(server.clients) < count:
+        assert time.monotonic() < deadline, "clients never connected"
+        time.sleep(0.01)
+
+def receive_all(client):
+    frames = []
+    while (frame := client.receive()) is not None:
+        frames.append(frame)
+    return frames
+
+@pytest.fixture
+def server():
+    # frames only sent once full, so batching doesn't depend on timing
+    server = TelemetryServer(decimation=3, batch_size=4, max_latency=float('inf'))
+    server.start()
+    yield server
+    server.stop()
+
+def test_frames_hold_decimated_batches_of_steps(server):
+    simulation = make_simulation()
+    simulation.publisher = server
+    with TelemetryClient('127.0.0.1', server.port, timeout=5) as client:
+        wait_for_clients(server, 1)
+
+        expected = []
+        for i in range(3 * 10):
+            simulation.step()
+            if i % 3 == 2:
+                pend = simulation.pendulum
+                expected.append((simulation.t, pend.angle, pend.angular_velocity, pend.x, pend.xdot,
+                                 simulation.controller.u))
+        # the last part filled batch is sent on stopping
+        server.stop()
+        frames = receive_all(client)
+
+    assert [sequence for sequence, samples in frames] == [0, 1, 2]
+    assert [len(samples) for sequence, samples in frames] == [4, 4, 2]
+    samples = np.concatenate([samples for sequence, samples in frames])
+    assert samples.dtype == SAMPLE_DTYPE
+    assert samples.tobytes() == np.array(expected, dtype=SAMPLE_DTYPE).tobytes()
+
+def test_frame_layout(server):
+    simulation = make_simulation()
+    simulation.publisher = server
+    with socket.create_connection(('127.0.0.1', server.port), timeout=5) as raw:
+        wait_for_clients(server, 1)
+        for i in range(3 * 4):
+            simulation.step()
+        data = b''
+        while len(data) < FRAME_HEADER.size + 4 * SAMPLE_DTYPE.itemsize:
+            data += raw.recv(4096)
+
+    assert FRAME_HEADER.size == 16
+    assert FRAME_HEADER.unpack_from(data) == (b'PTLM', 4, 0)
+    samples = np.frombuffer(data, dtype=SAMPLE_DTYPE, count=4, offset=FRAME_HEADER.size)
+    assert samples['t'][-1] == simulation.t
+
+def test_stalled_client_only_drops_its_own_frames():
+    server = TelemetryServer(batch_size=64, queue_frames=256)
+    server.start()
+    simulation = make_simulation()
+    simulation.publisher = server
+    try:
+        client = TelemetryClient('127.0.0.1', server.port, timeout=10)
+        frames = []
+        reader = threading.Thread(target=lambda: frames.extend(receive_all(client)))
+        reader.start()
+        # connected but never read, so its socket buffers fill and its queue overflows
+        stalled = socket.socket()
+        stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        stalled.connect(('127.0.0.1', server.port))
+        wait_for_clients(server, 2)
+
+        start = time.perf_counter()
+        steps = 64 * 8000
+        for i in range(steps):
+            simulation.step()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+    reader.join()
+    client.close()
+    stalled.close()
+
+    # the reading client got every frame in order, however far behind the stalled one fell
+    assert [sequence for sequence, samples in frames] == list(range(8000))
+    assert sum(len(samples) for sequence, samples in frames) == steps
+    assert server.dropped() > 0
+    # the simulation never waited for the stalled client
+    assert elapsed < 60
+
+@pytest.mark.parametrize('setting', [{'decimation': 0}, {'batch_size': 0}, {'batch_size': -1}, {'queue_frames': 0}])
+def test_rejects_settings_below_one(setting):
+    with pytest.raises(ValueError):
+        TelemetryServer(**setting)
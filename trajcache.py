@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+
+from simulation import TRAJECTORY_DTYPE, load_sample
+
+"""
+Content addressed on disk cache of simulated trajectories.
+
+A run is identified by the SHA-256 of everything that determines its trajectory: the parameters and state of
+Physics, the gains, mode and state of Control, the integrator, dt, the start time, the manual input and the
+number of steps. Trajectories are stored as .npy files named by that hash, so an identical run is served as a
+memory mapped array straight from the file instead of being integrated again. The directory is kept under a
+size limit by evicting the least recently used files, a hit refreshing the modification time of its file.
+"""
+
+# bumped whenever the simulation changes in a way that alters trajectories, so old entries are never served
+CACHE_VERSION = 1
+
+# attributes of Physics and Control determining a trajectory, leaving out those recomputed every step
+PHYSICS_FIELDS = ('angle', 'angular_velocity', 'u', 'xdot', 'x', 'dt', 'g', 'length', 'angular_damping',
+                  'cart_damping', 'angle_error_integral', 'cart_velocity_error_integral', 'cart_ref', 'angle_ref')
+CONTROL_FIELDS = ('kp', 'kd', 'ki', 'kp_cart', 'kd_cart', 'ki_cart', 'u', 'controller_enabled', 'mode',
+                  'lqr_q', 'lqr_r', 'lqr_capture_angle')
+
+def _canonical(value):
+    # floats by their exact hexadecimal representation, so equal keys mean bit identical parameters
+    if isinstance(value, (bool, np.bool_, str)) or value is None:
+        return value
+    if isinstance(value, (tuple, list)):
+        return [_canonical(item) for item in value]
+    return float(value).hex()
+
+def run_key(simulation, steps):
+    """Returns the hex SHA-256 key of running "simulation" for "steps" steps from its current state."""
+    pend = simulation.pendulum
+    ctrl = simulation.controller
+    integrator = pend.integrator
+    description = {
+        'version': CACHE_VERSION,
+        'dtype': TRAJECTORY_DTYPE.descr,
+        'physics': {name: _canonical(getattr(pend, name)) for name in PHYSICS_FIELDS},
+        'control': {name: _canonical(getattr(ctrl, name)) for name in CONTROL_FIELDS},
+        'integrator': [type(integrator).__name__,
+                       {name: _canonical(value) for name, value in sorted(vars(integrator).items())
+                        if name != 'evaluations'}],
+        't': _canonical(simulation.t),
+        'manual_input': _canonical(simulation.manual_input),
+        'steps': int(steps),
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+class TrajectoryCache:
+
+    """
+    Directory of cached trajectories with least recently used eviction by total size.
+
+
+    Attributes:
+    -----------
+    directory:
+        Directory holding one <key>.npy file per cached trajectory, created if missing
+    max_bytes:
+        Total size of the cached files beyond which the least recently used are evicted
+    hits, misses:
+        Numbers of runs served from and added to the cache by this instance
+
+
+    Methods:
+    --------
+    get(self, key):
+        Returns the cached trajectory of a key as a read only memory mapped array, or None
+    put(self, key, trajectory):
+        Stores a trajectory under a key, then evicts until the cache fits in max_bytes
+    run(self, simulation, steps=None, duration=None, fast=False):
+        As Simulation.run, but serving identical runs from the cache. The simulation is left in the state
+        after the last step either way, as if it had been run
+    evict(self):
+        Removes least recently used files until the cache fits in max_bytes
+    size(self):
+        Returns the total size in bytes of the cached files
+    clear(self):
+        Removes every cached file
+
+    """
+
+    def __init__(self, directory, max_bytes=1 << 30):
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def _entries(self):
+        # (modification time, size, path) of every cached file
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith('.npy') and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            trajectory = np.load(path, mmap_mode='r')
+            # marks the file as recently used
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+        return trajectory
+
+    def put(self, key, trajectory):
+        # written to a temporary file and renamed, so a file is never seen partly written, also by other processes
+        handle, temporary = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.save(file, np.ascontiguousarray(trajectory, dtype=TRAJECTORY_DTYPE))
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        self.evict()
+
+    def run(self, simulation, steps=None, duration=None, fast=False):
+
+        if (simulation.recorder is not None or simulation.metrics is not None or simulation.scenario is not None
+                or simulation.publisher is not None):
+            raise ValueError("Cached runs need no recorder, no metrics, no scenario and no publisher, which a cache "
+                             "hit doesn't update")
+        if steps is None:
+            if duration is None:
+                raise ValueError("Either steps or duration must be given")
+            steps = int(round(duration / simulation.pendulum.dt))
+
+        key = run_key(simulation, steps)
+        trajectory = self.get(key)
+        if trajectory is None:
+            self.misses += 1
+            trajectory = simulation.run(steps, fast=fast)
+            self.put(key, trajectory)
+            # served from the file like a hit, unless already evicted, e.g. being larger than the cache alone
+            cached = self.get(key)
+            trajectory = trajectory if cached is None else cached
+        else:
+            self.hits += 1
+            if len(trajectory):
+                simulation.t = load_sample(trajectory[-1], simulation.pendulum, simulation.controller)
+        return trajectory
+
+    def evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass # evicted by another process
+            total -= size
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        for _, _, path in self._entries():
+            os.unlink(path)
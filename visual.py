@@ -1,6 +1,8 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
+from matplotlib.transforms import Affine2D
+from telemetry import Telemetry
 
 class Visual:
 
@@ -25,17 +27,27 @@ class Visual:
         Matplotlib axes for cart position, cart velocity and control input in graph of pendulum
     theta, theta_dot, x_cart, x_dot, u_plot:
         Matplotlib plots for angle, angular velocity, cart position, cart velocity and control input
+    graph_window:
+        Width in seconds of the time axis of the graph, which is fixed while scrolling so the axes are only
+        redrawn when the window is changed
+    graph_scroll:
+        Translation applied to the plots before the data transform of the axes, scrolling the plots along the
+        fixed time axis like the trace of an oscilloscope
+    graph_offset:
+        Simulated time at the left edge of the time axis
     angle_label:
         Real time label showing angle of pendulum on pendulum animation figure
+    perf_label:
+        Performance overlay showing frame time and simulation rate on pendulum animation figure, empty when hidden
     x0, y0:
         Initial coordinates of pendulum 
     line, circle, leftwheel, rightwheel, cart, floor
         Pendulum rod, top of pendulum, wheels, cart and green floor as shapes drawn in matplotlib
     t:
-        Time count incremented by dt each animation cycle externally
-    t_list, angle_list, angular_velocity_list, cart_position_list, cart_velocity_list, u_list:
-        Lists of time, angle, angular velocity, cart position, cart velocity, control input incremented each
-        animation cycle used to plot the graph
+        Simulated time of the latest graph sample, set each animation cycle externally
+    telemetry:
+        Instance of Telemetry class, fixed capacity ring buffer of time, angle, angular velocity, cart position,
+        cart velocity and control input appended each animation cycle, used to plot the graph
     frames:
         Variable used for frame count generator
     paused:
@@ -48,14 +60,17 @@ class Visual:
         Generator function used for increasing frames in real time
     pause(self, press):
         Used to toggle pause boolean, tied to a button
-    update_pendulum(self, pend):
-        Used to update pendulum and cart positions repeatedly in Animations class
-    update_graph_lists(self, pend, ctrl):
-        Used to increment time and update lists for graph plot repeatedly in Animations class
-    limit_list_lengths(self):
-        Used to limit the lengths of growing lists not to cause performance issues in Animations class
-    plot_graph(self, t_list, angle_list, angular_velocity_list, cart_position_list, cart_velocity_list, u_list):
-        Used to repeatedly update the plots in the graph in the Animations class
+    update_pendulum(self, pend, angle=None, x=None):
+        Used to update pendulum and cart positions repeatedly in Animations class. Angle and cart position x
+        default to the current state of pend, but can be given to draw an interpolated state
+    update_graph_lists(self, pend, ctrl, t):
+        Used to set time to simulated time t and append a sample to the telemetry repeatedly in Animations class
+    plot_graph(self, history):
+        Used to repeatedly update the plots in the graph from a view of the telemetry in the Animations class
+    scroll_graph(self, t):
+        Scrolls the plots so time t is at the centre of the time axis once the first half of the axis is filled
+    set_graph_window(self, window):
+        Sets the width of the time axis in seconds, keeping 10 divisions, used to zoom the graph in and out
         
     """
 
@@ -63,7 +78,6 @@ class Visual:
 
         # creating figure & axes for pendulum animation
         self.fig = plt.figure()
-        self.fig.canvas.draw()
         self.ax = self.fig.add_subplot()
         self.ax.set_xlim(-50, 50)
         self.ax.set_ylim(-20, 50)
@@ -76,7 +90,7 @@ class Visual:
         # creating figure and axes for graph
         self.graph_fig = plt.figure()
         self.ax_graph = self.graph_fig.add_subplot()
-        self.ax_graph.set_xlim(0, 10)
+        self.graph_offset = 0
         self.ax_graph.set_ylim(-360, 360)
         self.ax_graph2 = self.ax_graph.twinx()
         self.ax_graph2.set_ylim(-150, 150)
@@ -88,15 +102,21 @@ class Visual:
         self.x_dot, = self.ax_graph2.plot([0], [0], 'g', lw = 1, label=r'$\dot{x}$')
         self.u_plot, = self.ax_graph2.plot([0], [0], 'm', lw = 1, label=r'$u$')
 
+        # plots scroll through a shared translation instead of changing the axes limits
+        self.graph_scroll = Affine2D()
+        for plot in (self.theta, self.theta_dot):
+            plot.set_transform(self.graph_scroll + self.ax_graph.transData)
+        for plot in (self.x_cart, self.x_dot, self.u_plot):
+            plot.set_transform(self.graph_scroll + self.ax_graph2.transData)
+
         self.ax_graph.set_title('Pendulum Plots')
-        self.ax_graph.set_xlabel('Time 1 s/div)')
         self.ax_graph.set_ylabel(r'$\theta$ (deg), $\dot \theta$ (deg/s)')
         self.ax_graph2.set_ylabel(r'$x$, $\dot{x}$, $\ddot{x}$')
         self.ax_graph.set_xticklabels([])
 
         self.ax_graph.grid()
         self.ax_graph2.grid()
-        self.ax_graph.xaxis.set_major_locator(ticker.MultipleLocator(1)) # 1 s/div
+        self.set_graph_window(10) # 1 s/div
 
         # legend for graph
         self.graph1_lines, self.graph1_labels = self.ax_graph.get_legend_handles_labels()
@@ -104,6 +124,7 @@ class Visual:
         self.ax_graph.legend(self.graph1_lines + self.graph2_lines, self.graph1_labels + self.graph2_labels, loc='upper right')
 
         self.angle_label = self.ax.text(0.5, 0.85, '', transform=self.ax.transAxes, fontsize=15, color='b')
+        self.perf_label = self.ax.text(0.02, 0.97, '', transform=self.ax.transAxes, fontsize=8, family='monospace', va='top')
 
         # creating objects in pendulum animation
         self.x0, self.y0 = self.pendulum.pendulum_pos(self.pendulum.init_angle)
@@ -119,13 +140,9 @@ class Visual:
 
         self.t = 0
 
-        # lists for graph plot
-        self.t_list = [0]
-        self.angle_list = [np.rad2deg(self.pendulum.init_angle)]
-        self.angular_velocity_list = [0]
-        self.cart_position_list = [0]
-        self.cart_velocity_list = [0]
-        self.u_list = [0]
+        # telemetry for graph plot, holding over 20 minutes of samples at 50 fps
+        self.telemetry = Telemetry(65536)
+        self.telemetry.append(0, np.rad2deg(self.pendulum.init_angle), 0, 0, 0, 0)
 
         self.frames = self.frame_count()
         self.paused = False
@@ -140,38 +157,39 @@ class Visual:
     def pause(self, press):
         self.paused = not self.paused
 
-    def update_pendulum(self, pend):
+    def update_pendulum(self, pend, angle=None, x=None):
+        if angle is None:
+            angle = pend.angle
+        if x is None:
+            x = pend.x
         # updating of pendulum positions in animation
-        self.x, self.y = pend.pendulum_pos(pend.angle)
-        self.line.set_data([pend.x, self.x], [0, self.y])
+        self.x, self.y = pend.pendulum_pos(angle, x)
+        self.line.set_data([x, self.x], [0, self.y])
         self.circle.set_center((self.x, self.y))
-        self.cart.set_xy((pend.x - 4, -1.5))
-        self.leftwheel.set_center((pend.x - 2.5, -1.5))
-        self.rightwheel.set_center((pend.x + 2.5, -1.5))
-        self.angle_label.set_text(str(int(np.rad2deg(pend.angle))) + "°")
-
-    def update_graph_lists(self, pend, ctrl):
-        # incrementing t and appending to graph plot lists 
-        self.t += pend.dt
-        self.t_list.append(self.t)
-        self.angle_list.append(np.rad2deg(pend.angle))
-        self.angular_velocity_list.append(np.rad2deg(pend.angular_velocity))
-        self.cart_position_list.append(pend.x)
-        self.cart_velocity_list.append(pend.xdot)
-        self.u_list.append(ctrl.u)
-
-    def limit_list_lengths(self):
-        if len(self.t_list) > 170:
-            self.t_list.pop(0)
-            self.angle_list.pop(0)
-            self.angular_velocity_list.pop(0)
-            self.cart_position_list.pop(0)
-            self.cart_velocity_list.pop(0)
-            self.u_list.pop(0)
-
-    def plot_graph(self, t_list, angle_list, angular_velocity_list, cart_position_list, cart_velocity_list, u_list):
-        self.theta.set_data(t_list, angle_list)
-        self.theta_dot.set_data(t_list, angular_velocity_list)
-        self.x_cart.set_data(t_list, cart_position_list)
-        self.x_dot.set_data(t_list, cart_velocity_list)
-        self.u_plot.set_data(t_list, u_list)
\ No newline at end of file
+        self.cart.set_xy((x - 4, -1.5))
+        self.leftwheel.set_center((x - 2.5, -1.5))
+        self.rightwheel.set_center((x + 2.5, -1.5))
+        self.angle_label.set_text(str(int(np.rad2deg(angle))) + "°")
+
+    def update_graph_lists(self, pend, ctrl, t):
+        # setting t and appending to graph telemetry
+        self.t = t
+        self.telemetry.append(self.t, np.rad2deg(pend.angle), np.rad2deg(pend.angular_velocity),
+                pend.x, pend.xdot, ctrl.u)
+
+    def plot_graph(self, history):
+        self.theta.set_data(history['t'], history['angle'])
+        self.theta_dot.set_data(history['t'], history['angular_velocity'])
+        self.x_cart.set_data(history['t'], history['x'])
+        self.x_dot.set_data(history['t'], history['xdot'])
+        self.u_plot.set_data(history['t'], history['u'])
+
+    def scroll_graph(self, t):
+        self.graph_offset = max(0, t - self.graph_window / 2)
+        self.graph_scroll.clear().translate(-self.graph_offset, 0)
+
+    def set_graph_window(self, window):
+        self.graph_window = window
+        self.ax_graph.set_xlim(0, window)
+        self.ax_graph.xaxis.set_major_locator(ticker.MultipleLocator(window / 10))
+        self.ax_graph.set_xlabel(f'Time ({window / 10:g} s/div)')